@@ -5,7 +5,106 @@ from PIL import Image, ImageTk
 import json
 import csv
 import sqlite3
-from fake_identity_system import FakeIdentitySystem
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fake_identity_system import FakeIdentitySystem, OperationCancelled
+
+PROGRESS_POLL_MS = 100
+GENERATE_CHUNK_SIZE = 10000
+MAX_DISPLAYED_IDENTITIES = 100
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_RESULT_LIMIT = 1000
+
+class VirtualTreeview:
+    # Treeview that only holds one screenful of items. Scrolling rewrites their values from
+    # row_source(index), so refreshing costs the same with a hundred rows or millions.
+    def __init__(self, master, columns, row_source, row_count):
+        self.tree = ttk.Treeview(master, columns=columns, show="headings", selectmode="browse")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+        self.scrollbar = ttk.Scrollbar(master, orient="vertical", command=self.yview)
+        self.row_source = row_source
+        self.row_count = row_count
+        self.indices = None  # None shows every row; a list shows only those rows (search results)
+        self.total = 0
+        self.first = 0
+        self.page_size = 1
+        self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        self.tree.bind("<Configure>", self.on_resize)
+        # Wheel events scroll the virtual rows instead of the Treeview's own (single page of) items.
+        self.tree.bind("<MouseWheel>", lambda event: self.on_mousewheel(-3 if event.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda event: self.on_mousewheel(-3))
+        self.tree.bind("<Button-5>", lambda event: self.on_mousewheel(3))
+
+    def refresh(self):
+        # Rows were appended: only empty slots on screen need filling, the rest is the scrollbar.
+        self.total = self.count_rows()
+        if len(self.tree.get_children()) < self.page_size or self.first + self.page_size > self.total:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def show(self, indices=None):
+        self.indices = indices
+        self.first = 0
+        self.render()
+
+    def count_rows(self):
+        return self.row_count() if self.indices is None else len(self.indices)
+
+    def render(self):
+        self.total = self.count_rows()
+        self.first = max(0, min(self.first, self.total - self.page_size))
+        items = self.tree.get_children()
+        rows = max(0, min(self.page_size, self.total - self.first))
+        if len(items) > rows:
+            self.tree.delete(*items[rows:])
+        for position in range(rows):
+            index = self.first + position
+            if self.indices is not None:
+                index = self.indices[index]
+            values = self.row_source(index)
+            if position < len(items):
+                self.tree.item(items[position], values=values)
+            else:
+                self.tree.insert("", "end", values=values)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.total:
+            self.scrollbar.set(self.first / self.total, min(self.first + self.page_size, self.total) / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, first):
+        first = max(0, min(first, self.total - self.page_size))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.first + rows)
+
+    def on_mousewheel(self, rows):
+        self.scroll(rows)
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            rows = int(args[1])
+            self.scroll(rows * self.page_size if args[2] == "pages" else rows)
+
+    def on_resize(self, event):
+        # The heading takes about one row; everything below it is the viewport.
+        page_size = max(1, event.height // self.row_height - 1)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.render()
 
 class GUI(ctk.CTk):
     def __init__(self):
@@ -15,9 +114,18 @@ class GUI(ctk.CTk):
         self.configure(fg_color="#1a1a2e")
         
         self.system = FakeIdentitySystem()
+        # Long operations run on one background thread; Tk is only touched from the main thread,
+        # which polls progress_queue and updates the widgets.
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.current_job = None
+        self.cancel_event = threading.Event()
+        self.progress_queue = queue.Queue()
+        self.visible_rows = 0
+        self.search_job = None
         
         self.load_and_set_icon()
         self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def load_and_set_icon(self):
         icon = Image.open("identity-alchemist-cover.png")
@@ -71,24 +179,21 @@ class GUI(ctk.CTk):
         self.progress_bar.set(0)
         
         columns = ("Name", "Age", "Gender", "Country")
-        self.identity_tree = ttk.Treeview(generate_frame, columns=columns, show="headings")
-        for col in columns:
-            self.identity_tree.heading(col, text=col)
-            self.identity_tree.column(col, width=100)
+        # Row count is a snapshot taken on the main thread, so rows still being generated are never read.
+        self.identity_view = VirtualTreeview(generate_frame, columns, self.identity_row, lambda: self.visible_rows)
+        self.identity_tree = self.identity_view.tree
         self.identity_tree.grid(row=3, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
-        
-        scrollbar = ttk.Scrollbar(generate_frame, orient="vertical", command=self.identity_tree.yview)
-        scrollbar.grid(row=3, column=2, sticky="ns")
-        self.identity_tree.configure(yscrollcommand=scrollbar.set)
+        self.identity_view.scrollbar.grid(row=3, column=2, sticky="ns")
         
         generate_frame.grid_rowconfigure(3, weight=1)
         
         search_label = ctk.CTkLabel(generate_frame, text="Search:", font=("Roboto", 14))
         search_label.grid(row=4, column=0, padx=10, pady=10, sticky="e")
         
-        self.search_entry = ctk.CTkEntry(generate_frame, font=("Roboto", 14))
+        self.search_entry = ctk.CTkEntry(generate_frame, font=("Roboto", 14), width=260,
+                                         placeholder_text="name, email, SSN or country:UK")
         self.search_entry.grid(row=4, column=1, padx=10, pady=10, sticky="w")
-        self.search_entry.bind("<KeyRelease>", self.search_identities)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
         
     def create_enhance_tab(self):
         enhance_frame = ctk.CTkFrame(self.notebook, fg_color="#16213e")
@@ -121,7 +226,7 @@ class GUI(ctk.CTk):
         export_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
         
         self.export_format_var = tk.StringVar(value="csv")
-        export_formats = ctk.CTkOptionMenu(export_import_frame, values=["csv", "json", "sql"], variable=self.export_format_var)
+        export_formats = ctk.CTkOptionMenu(export_import_frame, values=["csv", "json", "jsonl", "parquet", "arrow", "sql"], variable=self.export_format_var)
         export_formats.grid(row=0, column=1, padx=10, pady=10)
         
         export_button = ctk.CTkButton(export_import_frame, text="Export", font=("Roboto", 14), command=self.export_identities)
@@ -131,7 +236,7 @@ class GUI(ctk.CTk):
         import_label.grid(row=1, column=0, padx=10, pady=10, sticky="w")
         
         self.import_format_var = tk.StringVar(value="csv")
-        import_formats = ctk.CTkOptionMenu(export_import_frame, values=["csv", "json", "sql"], variable=self.import_format_var)
+        import_formats = ctk.CTkOptionMenu(export_import_frame, values=["csv", "json", "jsonl", "parquet", "arrow", "sql"], variable=self.import_format_var)
         import_formats.grid(row=1, column=1, padx=10, pady=10)
         
         import_button = ctk.CTkButton(export_import_frame, text="Import", font=("Roboto", 14), command=self.import_identities)
@@ -153,44 +258,114 @@ class GUI(ctk.CTk):
         self.encrypt_decrypt_text.pack(expand=True, fill="both", padx=10, pady=10)
         
     def create_status_bar(self):
+        status_frame = ctk.CTkFrame(self, fg_color="transparent")
+        status_frame.pack(side="bottom", fill="x", padx=10, pady=5)
+
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
-        status_bar = ctk.CTkLabel(self, textvariable=self.status_var, font=("Roboto", 10), anchor="w")
-        status_bar.pack(side="bottom", fill="x", padx=10, pady=5)
-        
+        status_bar = ctk.CTkLabel(status_frame, textvariable=self.status_var, font=("Roboto", 10), anchor="w")
+        status_bar.pack(side="left", fill="x", expand=True)
+
+        self.cancel_button = ctk.CTkButton(status_frame, text="Cancel", font=("Roboto", 12), width=80,
+                                           command=self.cancel_job, state="disabled")
+        self.cancel_button.pack(side="right")
+
+    def run_in_background(self, description, unit, task, on_done=None):
+        # task(progress) runs on the worker thread; progress(done, total) only queues the numbers.
+        if self.current_job is not None:
+            messagebox.showinfo("Busy", "Another operation is still running.")
+            return
+        self.cancel_event.clear()
+
+        def progress(done, total):
+            if self.cancel_event.is_set():
+                raise OperationCancelled()
+            self.progress_queue.put((done, total))
+
+        self.progress_bar.set(0)
+        self.cancel_button.configure(state="normal")
+        self.status_var.set(f"{description}...")
+        started = time.perf_counter()
+        self.current_job = self.executor.submit(task, progress)
+        self.after(PROGRESS_POLL_MS, self.poll_job, description, unit, started, on_done)
+
+    def poll_job(self, description, unit, started, on_done):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        latest = None
+        while not self.progress_queue.empty():
+            latest = self.progress_queue.get_nowait()
+        if latest is not None:
+            done, total = latest
+            if total:
+                self.progress_bar.set(done / total)
+            self.status_var.set(f"{description}: {done}{f'/{total}' if total else ''} {unit} ({done / elapsed:,.0f} {unit}/s)")
+
+        job = self.current_job
+        if not job.done():
+            self.after(PROGRESS_POLL_MS, self.poll_job, description, unit, started, on_done)
+            return
+        self.current_job = None
+        self.cancel_button.configure(state="disabled")
+        try:
+            result = job.result()
+        except OperationCancelled:
+            self.status_var.set(f"{description} cancelled after {elapsed:.1f}s")
+        except Exception as e:
+            self.status_var.set(f"{description} failed")
+            messagebox.showerror("Error", str(e))
+        else:
+            self.progress_bar.set(1)
+            if on_done:
+                on_done(result)
+            self.status_var.set(f"{description} finished in {elapsed:.1f}s")
+        # Whatever was added before a cancel or failure is kept, so show it.
+        self.update_identity_treeview()
+
+    def cancel_job(self):
+        if self.current_job is not None:
+            self.cancel_event.set()
+            self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        self.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
     def generate_identities(self):
         try:
             num_identities = int(self.num_identities_entry.get())
             if num_identities <= 0:
                 raise ValueError("Number of identities must be positive")
-            
-            self.progress_bar.set(0)
-            self.update_idletasks()
-            
-            self.system.generate_identities(num_identities)
-            self.update_identity_treeview()
-            
-            self.progress_bar.set(1)
-            self.status_var.set(f"Generated {num_identities} identities")
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        self.run_in_background(
+            f"Generating {num_identities} identities", "rows",
+            lambda progress: self.system.generate_identities(num_identities, progress=progress, chunk_size=GENERATE_CHUNK_SIZE)
+        )
         
     def update_identity_treeview(self):
-        self.identity_tree.delete(*self.identity_tree.get_children())
-        for i, identity in enumerate(self.system.generated_identities):
-            self.identity_tree.insert("", "end", values=(
-                f"{identity['first_name']} {identity['last_name']}",
-                identity['age'],
-                identity['gender'],
-                identity['country']
-            ))
+        self.visible_rows = len(self.system.generated_identities)
+        if self.search_entry.get():
+            self.search_identities(None)
+        else:
+            self.identity_view.refresh()
+
+    def identity_row(self, index):
+        identities = self.system.generated_identities
+        return (
+            f"{identities.column('first_name')[index]} {identities.column('last_name')[index]}",
+            identities.column('age')[index],
+            identities.column('gender')[index],
+            identities.column('country')[index]
+        )
         
     def train_model(self):
-        try:
-            self.system.train_model()
-            self.status_var.set("Model trained successfully")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        def train(progress):
+            if not self.system.train_model(progress):
+                raise Exception("Training failed, see the console output for details.")
+
+        self.run_in_background("Training model", "trees", train)
         
     def generate_enhanced_identity(self):
         try:
@@ -225,16 +400,18 @@ class GUI(ctk.CTk):
             messagebox.showerror("Error", str(e))
         
     def export_identities(self):
-        try:
-            format = self.export_format_var.get()
-            filename = filedialog.asksaveasfilename(defaultextension=f".{format}")
-            if filename:
-                self.system.export_identities(format, filename)
-                self.status_var.set(f"Identities exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        format = self.export_format_var.get()
+        filename = filedialog.asksaveasfilename(defaultextension=f".{format}")
+        if filename:
+            self.run_in_background(
+                f"Exporting to {filename}", "rows",
+                lambda progress: self.system.export_identities(format, filename, progress=progress)
+            )
         
     def import_identities(self):
+        if self.current_job is not None:
+            messagebox.showinfo("Busy", "Wait for the running operation to finish before importing.")
+            return
         try:
             format = self.import_format_var.get()
             filename = filedialog.askopenfilename(filetypes=[(f"{format.upper()} files", f"*.{format}")])
@@ -246,46 +423,64 @@ class GUI(ctk.CTk):
             messagebox.showerror("Error", str(e))
         
     def encrypt_identities(self):
-        try:
-            self.system.encrypt_identities()
-            self.encrypt_decrypt_text.delete("1.0", tk.END)
-            self.encrypt_decrypt_text.insert(tk.END, "Identities encrypted successfully.\n")
-            for i, identity in enumerate(self.system.encrypted_identities):
-                self.encrypt_decrypt_text.insert(tk.END, f"Encrypted Identity {i+1}:\n")
-                self.encrypt_decrypt_text.insert(tk.END, json.dumps(identity, indent=2) + "\n\n")
-            self.status_var.set("Identities encrypted")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.run_in_background("Encrypting identities", "rows",
+                               lambda progress: self.system.encrypt_identities(progress=progress),
+                               lambda result: self.show_encrypted_identities())
+
+    def show_encrypted_identities(self):
+        self.encrypt_decrypt_text.delete("1.0", tk.END)
+        self.encrypt_decrypt_text.insert(tk.END, "Identities encrypted successfully.\n")
+        # Only the first few go into the textbox; inserting hundreds of thousands would freeze Tk.
+        for i, identity in enumerate(self.system.encrypted_identities[:MAX_DISPLAYED_IDENTITIES]):
+            self.encrypt_decrypt_text.insert(tk.END, f"Encrypted Identity {i+1}:\n")
+            self.encrypt_decrypt_text.insert(tk.END, json.dumps(identity, indent=2) + "\n\n")
+        hidden = len(self.system.encrypted_identities) - MAX_DISPLAYED_IDENTITIES
+        if hidden > 0:
+            self.encrypt_decrypt_text.insert(tk.END, f"... and {hidden} more.\n")
         
     def decrypt_identities(self):
-        try:
-            self.encrypt_decrypt_text.delete("1.0", tk.END)
-            self.encrypt_decrypt_text.insert(tk.END, "Identities decrypted successfully.\n")
+        self.run_in_background("Decrypting identities", "rows",
+                               lambda progress: self.system.decrypt_identities(progress=progress),
+                               lambda result: self.show_decrypted_identities())
 
-            self.system.decrypted_identities = []
-            for encrypted_identity in self.system.encrypted_identities:
-                decrypted_identity = self.system.identity_encryptor.decrypt_identity(encrypted_identity)  # Pass encrypted_identity
-                self.system.decrypted_identities.append(decrypted_identity)
+    def show_decrypted_identities(self):
+        decrypted_identities = self.system.decrypted_identities
+        failures = self.system.decryption_failures
+        self.encrypt_decrypt_text.delete("1.0", tk.END)
+        self.encrypt_decrypt_text.insert(tk.END, f"Decrypted {len(decrypted_identities)} identities "
+                                                 f"({len(failures)} failed).\n")
+        # Capped like show_encrypted_identities, failures included.
+        for index, error in failures[:MAX_DISPLAYED_IDENTITIES]:
+            self.encrypt_decrypt_text.insert(tk.END, f"Record {index + 1} failed: {error}\n")
+        if len(failures) > MAX_DISPLAYED_IDENTITIES:
+            self.encrypt_decrypt_text.insert(tk.END, f"... and {len(failures) - MAX_DISPLAYED_IDENTITIES} more failures.\n")
 
-            for i, identity in enumerate(self.system.decrypted_identities):
-                self.encrypt_decrypt_text.insert(tk.END, f"Decrypted Identity {i+1}:\n")
-                self.encrypt_decrypt_text.insert(tk.END, json.dumps(identity, indent=2) + "\n\n")
-            self.status_var.set("Identities decrypted")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        for i, identity in enumerate(decrypted_identities[:MAX_DISPLAYED_IDENTITIES]):
+            self.encrypt_decrypt_text.insert(tk.END, f"Decrypted Identity {i+1}:\n")
+            self.encrypt_decrypt_text.insert(tk.END, json.dumps(identity, indent=2) + "\n\n")
+        hidden = len(decrypted_identities) - MAX_DISPLAYED_IDENTITIES
+        if hidden > 0:
+            self.encrypt_decrypt_text.insert(tk.END, f"... and {hidden} more.\n")
+        
+    def schedule_search(self, event):
+        # Debounced: a query runs once typing pauses, not on every key press.
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DEBOUNCE_MS, self.search_identities)
 
-        
-    def search_identities(self, event):
-        search_term = self.search_entry.get().lower()
-        self.identity_tree.delete(*self.identity_tree.get_children())
-        for identity in self.system.generated_identities:
-            if search_term in f"{identity['first_name']} {identity['last_name']}".lower():
-                self.identity_tree.insert("", "end", values=(
-                    f"{identity['first_name']} {identity['last_name']}",
-                    identity['age'],
-                    identity['gender'],
-                    identity['country']
-                ))
+    def search_identities(self, event=None):
+        self.search_job = None
+        search_term = self.search_entry.get()
+        if not search_term.strip():
+            self.identity_view.show()
+            return
+        started = time.perf_counter()
+        # The index is kept current by add_identities (possibly on the worker thread); rows the view
+        # has not picked up yet are left out.
+        rows = [row for row in self.system.search_index.query(search_term, SEARCH_RESULT_LIMIT) if row < self.visible_rows]
+        self.identity_view.show(rows)
+        capped = " (first matches only)" if len(rows) == SEARCH_RESULT_LIMIT else ""
+        self.status_var.set(f"{len(rows)} matches{capped} in {(time.perf_counter() - started) * 1000:.1f} ms")
 
 if __name__ == "__main__":
     app = GUI()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_identity_system import ConditionalDistributionEnhancer, IdentityGenerator, MachineLearningModel
+
+# Compares the enhancer engines on speed (single-identity latency, batch throughput) and on how
+# closely the countries they assign follow the training data, measured as total variation distance.
+
+def skewed_batch(generator, n, skew):
+    # Generated countries are independent of the features, which leaves nothing to learn; tying
+    # a share of the rows' country to their occupation gives the engines a real conditional.
+    batch = generator.generate_batch(n)
+    tied = generator.rng.random(n) < skew
+    batch['country'] = [
+        generator.countries[generator.occupations.index(occupation)] if is_tied else country
+        for is_tied, occupation, country in zip(tied.tolist(), batch['occupation'], batch['country'])
+    ]
+    return batch
+
+def country_distribution(countries, labels):
+    counts = np.array([np.count_nonzero(countries == label) for label in labels], dtype=float)
+    return counts / max(counts.sum(), 1)
+
+def total_variation(p, q):
+    return 0.5 * float(np.abs(p - q).sum())
+
+def fidelity(reference, enhanced, labels, condition='occupation'):
+    reference_countries = np.array(reference['country'], dtype=object)
+    enhanced_countries = np.array(enhanced, dtype=object)
+    marginal = total_variation(country_distribution(reference_countries, labels), country_distribution(enhanced_countries, labels))
+    # Conditional TV distance, averaged over the values of `condition` weighted by their frequency.
+    conditions = np.array(reference[condition], dtype=object)
+    conditional = 0.0
+    for value in set(reference[condition]):
+        rows = conditions == value
+        conditional += rows.mean() * total_variation(
+            country_distribution(reference_countries[rows], labels),
+            country_distribution(enhanced_countries[rows], labels)
+        )
+    return marginal, conditional
+
+def benchmark(name, model, train_batch, eval_batch, latency_calls):
+    X, y = model.prepare_data(train_batch)
+    started = time.perf_counter()
+    model.train(X, y)
+    train_seconds = time.perf_counter() - started
+
+    identities = [{field: values[index] for field, values in eval_batch.items()} for index in range(latency_calls)]
+    started = time.perf_counter()
+    for identity in identities:
+        model.predict(identity)
+    latency = (time.perf_counter() - started) / latency_calls
+
+    started = time.perf_counter()
+    enhanced = model.predict_batch(eval_batch)
+    batch_seconds = time.perf_counter() - started
+
+    marginal, conditional = fidelity(eval_batch, enhanced, model.countries)
+    return {
+        'enhancer': name,
+        'train_seconds': train_seconds,
+        'predict_latency_us': latency * 1e6,
+        'batch_rows_per_second': len(enhanced) / batch_seconds,
+        'tv_marginal': marginal,
+        'tv_conditional': conditional
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark country enhancers for speed and distributional fidelity.")
+    parser.add_argument('--train-size', type=int, default=50000)
+    parser.add_argument('--size', type=int, default=200000)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--latency-calls', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="Write the results to this file as JSON.")
+    args = parser.parse_args()
+
+    generator = IdentityGenerator(seed=args.seed)
+    train_batch = skewed_batch(generator, args.train_size, args.skew)
+    eval_batch = skewed_batch(generator, args.size, args.skew)
+
+    results = [
+        benchmark('forest', MachineLearningModel(), train_batch, eval_batch, args.latency_calls),
+        benchmark('conditional', ConditionalDistributionEnhancer(seed=args.seed), train_batch, eval_batch, args.latency_calls)
+    ]
+
+    print(f"{'enhancer':<12} {'train s':>9} {'latency us':>11} {'rows/s':>12} {'TV marginal':>12} {'TV cond.':>9}")
+    for result in results:
+        print(f"{result['enhancer']:<12} {result['train_seconds']:>9.2f} {result['predict_latency_us']:>11.1f} "
+              f"{result['batch_rows_per_second']:>12.0f} {result['tv_marginal']:>12.4f} {result['tv_conditional']:>9.4f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as jsonfile:
+            json.dump({'arguments': vars(args), 'results': results}, jsonfile, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_identity_system import (DataValidator, FakeIdentitySystem, IdentityAnalyzer, IdentityEncryptor,
+                                  IdentityExporter, IdentityGenerator, IdentityTable)
+
+# Runs every pipeline stage at several dataset sizes and reports throughput, peak traced memory and
+# per-row latency percentiles. Results are written as JSON and can be compared against a baseline
+# file, exiting non-zero when a stage got slower or hungrier than the tolerance allows.
+#
+# Each stage returns prepare, which builds fresh state for one timed run (outside the timing), and
+# a per-row function for the latency pass.
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+LATENCY_PERCENTILES = (50, 90, 99)
+MIN_SAMPLE_SECONDS = 0.2
+
+def stage_generate(size, dataset, workdir):
+    # A fresh system per run, so repeats never append to the previous run's table.
+    def prepare():
+        system = FakeIdentitySystem(index_identities=False)
+        return lambda: system.generate_identities(size)
+
+    generator = IdentityGenerator()
+    return prepare, (lambda identity: generator.generate_identity())
+
+def stage_generate_vectorized(size, dataset, workdir):
+    # Pools are a one-off cost per process; they are built once here and every run starts warm.
+    generator = IdentityGenerator()
+    pools = generator.build_pools()
+
+    def prepare():
+        system = FakeIdentitySystem(index_identities=False)
+        system.identity_generator.use_pool(pools)
+        return lambda: system.generate_identities(size, vectorized=True)
+
+    return prepare, (lambda identity: generator.generate_batch(1))
+
+def stage_validate(size, dataset, workdir):
+    validator = DataValidator()
+    system = FakeIdentitySystem(index_identities=False)
+    return (lambda: lambda: validator.validate_batch(dataset)), system.validate_identity
+
+def stage_analyze(size, dataset, workdir):
+    analyzer = IdentityAnalyzer()
+    return (lambda: lambda: IdentityAnalyzer(dataset)), (lambda identity: analyzer.update([identity]))
+
+def stage_encrypt(size, dataset, workdir):
+    encryptor = IdentityEncryptor()
+    return (lambda: lambda: encryptor.encrypt_identities(dataset)), encryptor.encrypt_identity
+
+def stage_export_sql(size, dataset, workdir):
+    db_name = os.path.join(workdir, f"bench-{size}.db")
+
+    def run():
+        IdentityExporter.export_to_sql(dataset, db_name, mode='replace')
+
+    # One single-row export per call: the cost of a tiny append, indexes included.
+    row_db_name = os.path.join(workdir, f"bench-{size}-rows.db")
+    return (lambda: run), (lambda identity: IdentityExporter.export_to_sql([identity], row_db_name))
+
+STAGES = {
+    'generate': stage_generate,
+    'generate_vectorized': stage_generate_vectorized,
+    'validate': stage_validate,
+    'analyze': stage_analyze,
+    'encrypt': stage_encrypt,
+    'export_sql': stage_export_sql
+}
+
+def timed(prepare, min_seconds=MIN_SAMPLE_SECONDS):
+    # Seconds per run. Short stages are run several times per sample so that timer and scheduler
+    # jitter averages out; only the runs themselves are timed, not prepare.
+    elapsed = 0.0
+    runs = 0
+    while runs == 0 or elapsed < min_seconds:
+        run = prepare()
+        started = time.perf_counter()
+        run()
+        elapsed += time.perf_counter() - started
+        runs += 1
+    return elapsed / runs
+
+def traced_peak(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def latency_percentiles(row_function, identities):
+    latencies = []
+    for identity in identities:
+        started = time.perf_counter()
+        row_function(identity)
+        latencies.append(time.perf_counter() - started)
+    values = np.percentile(np.array(latencies) * 1e6, LATENCY_PERCENTILES)
+    return {f"p{percentile}": float(value) for percentile, value in zip(LATENCY_PERCENTILES, values)}
+
+def run_size(stages, size, dataset, workdir, latency_samples, measure_memory, repeat=3):
+    prepared = {name: STAGES[name](size, dataset, workdir) for name in stages}
+    runs = {name: [] for name in stages}
+    results = []
+    # Stage output (e.g. "Generated N fake identities.") would drown the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Repeats go round-robin over the stages, so a slow spell of the machine shows up as spread
+        # in every stage instead of as a slowdown of whichever stage happened to be running.
+        for _ in range(repeat):
+            for name in stages:
+                runs[name].append(timed(prepared[name][0]))
+        for name in stages:
+            prepare, row_function = prepared[name]
+            seconds = statistics.median(runs[name])
+            results.append({
+                'stage': name,
+                'size': size,
+                'seconds': seconds,
+                'spread': (max(runs[name]) - min(runs[name])) / seconds,
+                'rows_per_second': size / seconds,
+                'peak_memory_bytes': traced_peak(prepare()) if measure_memory else None,
+                'latency_us': latency_percentiles(row_function, dataset[:min(latency_samples, size)])
+            })
+    return results
+
+def compare(results, baseline, tolerance):
+    # A stage regresses when its throughput drops, or its peak memory grows, by more than tolerance.
+    # The allowed slowdown widens to the spread between repeats seen in either run, so stages too
+    # short to time steadily are not flagged on noise alone.
+    previous = {(result['stage'], result['size']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['stage'], result['size']))
+        if before is None:
+            continue
+        speed = result['rows_per_second'] / before['rows_per_second']
+        result['baseline_speed_ratio'] = speed
+        if speed < 1 - max(tolerance, result['spread'], before.get('spread', 0.0)):
+            regressions.append(f"{result['stage']} @ {result['size']}: {speed:.2f}x baseline rows/s")
+        if result['peak_memory_bytes'] and before.get('peak_memory_bytes'):
+            memory = result['peak_memory_bytes'] / before['peak_memory_bytes']
+            result['baseline_memory_ratio'] = memory
+            if memory > 1 + tolerance:
+                regressions.append(f"{result['stage']} @ {result['size']}: {memory:.2f}x baseline peak memory")
+    return regressions
+
+def print_results(results):
+    print(f"{'stage':<20} {'size':>9} {'rows/s':>12} {'peak MB':>9} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'vs base':>8}")
+    for result in results:
+        peak = f"{result['peak_memory_bytes'] / 2 ** 20:.1f}" if result['peak_memory_bytes'] is not None else '-'
+        ratio = f"{result['baseline_speed_ratio']:.2f}x" if 'baseline_speed_ratio' in result else '-'
+        latency = result['latency_us']
+        print(f"{result['stage']:<20} {result['size']:>9} {result['rows_per_second']:>12.0f} {peak:>9} "
+              f"{latency['p50']:>9.1f} {latency['p90']:>9.1f} {latency['p99']:>9.1f} {ratio:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the identity pipeline stages.")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated stages to run.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="Comma-separated dataset sizes.")
+    parser.add_argument('--latency-samples', type=int, default=1000, help="Rows timed one by one per stage and size.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage and size; the median counts.")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass (halves the run time).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown or memory growth; slowdowns also get the measured spread.")
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}. Choose from: {', '.join(STAGES)}.")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            # Every stage of a size works on the same seeded dataset, built outside the timings.
+            dataset = IdentityTable.from_batch(IdentityGenerator(seed=args.seed).generate_batch(size))
+            for result in run_size(stages, size, dataset, workdir, args.latency_samples, not args.no_memory, args.repeat):
+                results.append(result)
+                print(f"{result['stage']} @ {size}: {result['rows_per_second']:.0f} rows/s", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baselinefile:
+            regressions = compare(results, json.load(baselinefile), args.tolerance)
+
+    print_results(results)
+    with open(args.output, 'w', encoding='utf-8') as outputfile:
+        json.dump({
+            'metadata': {
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': np.__version__,
+                'seed': args.seed,
+                'repeat': args.repeat
+            },
+            'results': results
+        }, outputfile, indent=4)
+    print(f"Results written to {args.output}")
+
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,386 @@
+import os
+import sys
+import math
 import random
 import string
 import datetime
+import time
+import threading
+import functools
+import contextlib
+import cProfile
+import pstats
+import tracemalloc
 from datetime import date
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from faker import Faker
+from faker.providers.credit_card import Provider as CreditCardProvider
 from cryptography.fernet import Fernet
 import csv
 import json
 import sqlite3
 import re
-from collections import Counter
+import gzip
+import glob
+import hashlib
+import joblib
+from array import array
+from collections import Counter, deque
+from collections.abc import Mapping, Sized
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, chain, islice, repeat
 
-class IdentityGenerator:
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+IDENTITY_FIELDS = ['first_name', 'last_name', 'gender', 'dob', 'age', 'country', 'ethnicity',
+                   'education', 'occupation', 'email', 'phone', 'address', 'credit_card', 'ssn']
+
+SHARD_SIZE = 50000
+
+SQL_CHUNK_SIZE = 100000
+SQL_EXPORT_MODES = ('append', 'replace', 'upsert')
+SQL_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQL_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+VALIDATION_CHUNK_SIZE = 100000
+
+ENCRYPTION_CHUNK_SIZE = 10000
+SENSITIVE_FIELDS = ('ssn', 'credit_card', 'email', 'phone', 'address')
+RECORD_ENVELOPE_FIELD = 'record'
+
+JSONL_BUFFER_SIZE = 1 << 20
+ARROW_ROW_GROUP_SIZE = 128 * 1024
+
+# Unique mode derives email tag, SSN and card number from the global row index, each through its
+# own permutation i -> (i * multiplier + offset) mod space. Multipliers and offsets are drawn per
+# field from unique_key, so one value does not give away the others without the key.
+UNIQUE_SSN_SPACE = 898 * 99 * 9999  # areas 001-899 except 666, groups 01-99, serials 0001-9999
+UNIQUE_CARD_SPACE = 10 ** 14  # account digits between the visa prefix and the Luhn check digit
+UNIQUE_EMAIL_SPACE = 10 ** 9  # email tags, at least UNIQUE_SSN_SPACE so every row gets its own
+UNIQUE_FIELD_SPACES = {'email': UNIQUE_EMAIL_SPACE, 'ssn': UNIQUE_SSN_SPACE, 'credit_card': UNIQUE_CARD_SPACE}
+
+# Suggested location for FakeIdentitySystem(model_cache_dir=...); caching is off unless a directory is given.
+MODEL_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'identity-alchemist', 'models')
+MODEL_CACHE_VERSION = 1
+MODEL_CACHE_KEEP = 3
+
+ENHANCERS = ('forest', 'conditional')
+
+SEARCH_RESULT_LIMIT = 1000
+SSN_PATTERN = re.compile(r'^\d{3}-\d{2}-\d{4}$')
+
+SQL_INDEXES = [('idx_identities_email', 'email'), ('idx_identities_ssn', 'ssn'), ('idx_identities_country', 'country')]
+
+PROGRESS_INTERVAL = 10000
+TRAINING_PROGRESS_TREES = 10
+
+class OperationCancelled(Exception):
+    # Raised from a progress(done, total) callback to abort the running operation.
+    pass
+
+class Instrumentation:
+    # Timers and counters for FakeIdentitySystem operations and Faker provider calls. Disabled (the
+    # default) an instrumented operation costs one attribute check and provider calls are not
+    # wrapped at all. Hooks are callables hook(operation, metrics) run after every top-level
+    # operation, e.g. to forward the metrics to an external collector.
     def __init__(self):
+        self.enabled = False
+        self.profile = False
+        self.trace_memory = False
+        self.timers = {}
+        self.counters = Counter()
+        self.profiles = {}
+        self.hooks = []
+        self.depth = 0
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def record(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextlib.contextmanager
+    def operation(self, name):
+        # Only the outermost operation is profiled and memory-traced; nested ones are just timed.
+        outermost = self.depth == 0
+        self.depth += 1
+        counters_before = Counter(self.counters)
+        profiler = cProfile.Profile() if self.profile and outermost else None
+        tracing = self.trace_memory and outermost
+        if tracing:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if profiler:
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if profiler:
+                profiler.disable()
+                self.profiles[name] = pstats.Stats(profiler)
+            peak_memory = None
+            if tracing:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self.depth -= 1
+            self.record(name, seconds)
+            if outermost:
+                metrics = {
+                    'seconds': seconds,
+                    'counters': dict(self.counters - counters_before),
+                    'peak_memory': peak_memory,
+                    'profile': self.profiles.get(name) if profiler else None
+                }
+                for hook in self.hooks:
+                    hook(name, metrics)
+
+    def timed(self, name, function):
+        def timed_function(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - started)
+        return timed_function
+
+    def summary(self):
+        return {
+            'timers': {
+                name: {'count': count, 'total_seconds': total, 'mean_seconds': total / count, 'max_seconds': longest}
+                for name, (count, total, longest) in self.timers.items()
+            },
+            'counters': dict(self.counters)
+        }
+
+    def reset(self):
+        self.timers = {}
+        self.counters = Counter()
+        self.profiles = {}
+
+    def print_summary(self):
+        print(f"{'timer':<36} {'calls':>9} {'total s':>10} {'mean ms':>10}")
+        for name, (count, total, _) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            print(f"{name:<36} {count:>9} {total:>10.3f} {total / count * 1000:>10.3f}")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:<36} {value:>9}")
+
+class TimedFaker:
+    # Stands in for a generator's Faker instance while instrumentation is enabled, timing every
+    # provider call under "faker.<provider>".
+    def __init__(self, fake, instrumentation):
+        self.fake = fake
+        self.instrumentation = instrumentation
+        self.providers = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.fake, name)
+        if not callable(attribute):
+            return attribute
+        provider = self.providers.get(name)
+        if provider is None:
+            provider = self.providers[name] = self.instrumentation.timed(f"faker.{name}", attribute)
+        return provider
+
+def instrumented(operation):
+    # Wraps a FakeIdentitySystem method in an Instrumentation.operation when instrumentation is enabled.
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.instrumentation.enabled:
+                return method(self, *args, **kwargs)
+            with self.instrumentation.operation(operation):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def iter_with_progress(identities, progress, interval=PROGRESS_INTERVAL):
+    total = len(identities) if isinstance(identities, Sized) else None
+    done = 0
+    for identity in identities:
+        yield identity
+        done += 1
+        if done % interval == 0:
+            progress(done, total)
+    progress(done, total)
+
+class FakerValuePool:
+    # Pre-sampled values per Faker provider, drawn by random index. reuse_ratio is the share of
+    # draws served from the pool (1.0 = never call Faker again); the rest are fresh provider
+    # calls that also replace random pool entries. memory_limit caps the estimated bytes held
+    # across all pools; once a pool reaches its share, new values evict random old ones.
+    def __init__(self, providers, pool_size=2000, reuse_ratio=1.0, memory_limit=None):
+        if not 0.0 <= reuse_ratio <= 1.0:
+            raise ValueError("reuse_ratio must be between 0 and 1.")
+        self.providers = providers
+        self.pool_size = pool_size
+        self.reuse_ratio = reuse_ratio
+        self.memory_limit = memory_limit
+        self.pools = {name: [] for name in providers}
+        self.memory = {name: 0 for name in providers}
+        self.arrays = {}
+
+    def memory_budget(self):
+        if self.memory_limit is None:
+            return None
+        return self.memory_limit // len(self.providers)
+
+    def fill(self):
+        for name, provider in self.providers.items():
+            self.insert(name, (provider() for _ in range(self.pool_size - len(self.pools[name]))))
+        return self
+
+    def insert(self, name, values, rng=None):
+        pool = self.pools[name]
+        budget = self.memory_budget()
+        for value in values:
+            size = sys.getsizeof(value)
+            if not pool or (len(pool) < self.pool_size and (budget is None or self.memory[name] + size <= budget)):
+                pool.append(value)
+                self.memory[name] += size
+                continue
+            if rng is None:
+                break
+            # Full pool: evict random entries until the new value fits.
+            slot = int(rng.integers(0, len(pool)))
+            self.memory[name] += size - sys.getsizeof(pool[slot])
+            pool[slot] = value
+            while budget is not None and self.memory[name] > budget and len(pool) > 1:
+                slot = int(rng.integers(0, len(pool)))
+                self.memory[name] -= sys.getsizeof(pool[slot])
+                pool[slot] = pool[-1]
+                pool.pop()
+        self.arrays.pop(name, None)
+
+    def array(self, name):
+        if name not in self.arrays:
+            self.arrays[name] = np.array(self.pools[name], dtype=object)
+        return self.arrays[name]
+
+    def draw(self, name, n, rng):
+        pool = self.array(name)
+        values = pool[rng.integers(0, len(pool), n)]
+        if self.reuse_ratio < 1.0:
+            fresh = np.flatnonzero(rng.random(n) >= self.reuse_ratio)
+            provider = self.providers[name]
+            fresh_values = [provider() for _ in range(len(fresh))]
+            values[fresh] = fresh_values
+            self.insert(name, fresh_values, rng)
+        return values
+
+    def memory_usage(self):
+        return sum(self.memory.values())
+
+    def copy(self, providers=None):
+        pool = FakerValuePool(providers or self.providers, self.pool_size, self.reuse_ratio, self.memory_limit)
+        pool.pools = {name: list(values) for name, values in self.pools.items()}
+        pool.memory = dict(self.memory)
+        return pool
+
+    def save(self, filename, metadata=None):
+        # Written to a temporary file first so concurrent workers never see a partial pool file.
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, 'w', encoding='utf-8') as poolfile:
+            json.dump({'metadata': metadata or {}, 'pools': self.pools}, poolfile, ensure_ascii=False)
+        os.replace(temporary_filename, filename)
+
+    def load(self, filename):
+        with open(filename, 'r', encoding='utf-8') as poolfile:
+            saved = json.load(poolfile)
+        for name in self.providers:
+            self.pools[name] = []
+            self.memory[name] = 0
+            self.insert(name, saved['pools'].get(name, []))
+        return saved.get('metadata', {})
+
+class IdentityGenerator:
+    # Faker card types whose numbers pass DataValidator (Luhn, 13-19 digits); maestro is only 12.
+    valid_card_types = ['mastercard', 'visa16', 'visa13', 'visa19', 'amex', 'discover', 'diners', 'jcb15', 'jcb16']
+    email_unsafe_pattern = re.compile(r'[^\w.-]')
+    # Zero-padded SSN pieces, concatenated by lookup in unique mode instead of formatted per row.
+    ssn_areas = [f"{area:03d}-" for area in range(900)]
+    ssn_groups = [f"{group:02d}-" for group in range(100)]
+    ssn_serials = [f"{serial:04d}" for serial in range(10000)]
+
+    def __init__(self, seed=None, pool_size=2000, valid=False, reuse_ratio=1.0, pool_memory_limit=None, pool_file=None,
+                 unique=False, row_offset=0, unique_key=None):
+        # valid=True generates every identity valid by construction: normalized +1 phone numbers,
+        # bare Luhn-valid card numbers and email local parts restricted to DataValidator's charset.
+        # unique=True makes email, SSN and card number unique per global row index, starting at row_offset.
+        # Values are only guaranteed distinct between generators that share unique_key and use
+        # disjoint row ranges. Without a key, one is derived from seed, or drawn at random when
+        # unseeded; keep it secret to keep the fields unlinkable.
+        self.valid = valid
+        self.unique = unique
+        self.next_row = row_offset
+        if unique_key is None:
+            unique_key = np.random.SeedSequence(seed).entropy
+        self.unique_key = unique_key
+        self.unique_permutations = self.permutations(unique_key) if unique else None
+        self.seed = seed
         self.fake = Faker()
+        if seed is not None:
+            self.fake.seed_instance(seed)
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        self.pool_size = pool_size
+        self.reuse_ratio = reuse_ratio
+        self.pool_memory_limit = pool_memory_limit
+        self.pool_file = pool_file
+        self.value_pool = None
         self.countries = ['USA', 'Canada', 'UK', 'Australia', 'Germany', 'France', 'Spain', 'Italy', 'Japan', 'Brazil']
         self.ethnicities = ['Caucasian', 'African American', 'Hispanic', 'Asian', 'Middle Eastern', 'Native American', 'Pacific Islander']
         self.education_levels = ['High School', 'Associate', 'Bachelor', 'Master', 'PhD']
         self.occupations = ['Engineer', 'Teacher', 'Doctor', 'Lawyer', 'Accountant', 'Manager', 'Salesperson', 'Artist', 'Programmer', 'Nurse']
 
     def generate_identity(self):
-        gender = random.choice(['Male', 'Female'])
+        gender = self.random.choice(['Male', 'Female'])
         first_name = self.fake.first_name_male() if gender == 'Male' else self.fake.first_name_female()
         last_name = self.fake.last_name()
         dob = self.fake.date_of_birth(minimum_age=18, maximum_age=80)
         age = (date.today() - dob).days // 365
-        country = random.choice(self.countries)
-        ethnicity = random.choice(self.ethnicities)
-        education = random.choice(self.education_levels)
-        occupation = random.choice(self.occupations)
-        email = f"{first_name.lower()}.{last_name.lower()}@{self.fake.free_email_domain()}"
-        phone = self.fake.phone_number()
-        address = self.fake.address().replace('\n', ', ')
-        credit_card = self.fake.credit_card_full()
-        ssn = self.fake.ssn()
+        country = self.random.choice(self.countries)
+        ethnicity = self.random.choice(self.ethnicities)
+        education = self.random.choice(self.education_levels)
+        occupation = self.random.choice(self.occupations)
+        local_part = f"{self.email_local_part(first_name)}.{self.email_local_part(last_name)}"
+        phone = self.make_phone()
+        address = self.make_address()
+        if self.unique:
+            (email_tag,), (ssn,), (credit_card,) = self.unique_values(1)
+            local_part = f"{local_part}.{email_tag}"
+        else:
+            credit_card = self.make_credit_card()
+            ssn = self.fake.ssn()
+        email = f"{local_part}@{self.fake.free_email_domain()}"
 
         return {
             'first_name': first_name,
@@ -54,72 +399,864 @@ class IdentityGenerator:
             'ssn': ssn
         }
 
-class MachineLearningModel:
+    def email_local_part(self, name):
+        name = name.lower()
+        if self.valid:
+            name = self.email_unsafe_pattern.sub('', name) or 'user'
+        return name
+
+    def make_phone(self):
+        if self.valid:
+            return '+1' + self.fake.numerify('%##%######')
+        return self.fake.phone_number()
+
+    def make_address(self):
+        return self.fake.address().replace('\n', ', ')
+
+    def make_credit_card(self):
+        if self.valid:
+            return self.fake.credit_card_number(card_type=self.random.choice(self.valid_card_types))
+        return self.fake.credit_card_full()
+
+    @staticmethod
+    def permutations(unique_key):
+        # Multipliers stay below 2 ** 32 so row * multiplier fits in int64 for every row index.
+        permutations = {}
+        for index, (field, space) in enumerate(UNIQUE_FIELD_SPACES.items()):
+            rng = np.random.default_rng([unique_key, index])
+            multiplier = int(rng.integers(2 ** 16, 2 ** 32))
+            while math.gcd(multiplier, space) != 1:
+                multiplier += 1
+            permutations[field] = (multiplier, int(rng.integers(0, space)), space)
+        return permutations
+
+    def permuted(self, field, rows):
+        multiplier, offset, space = self.unique_permutations[field]
+        return (rows * multiplier + offset) % space
+
+    def unique_values(self, n):
+        # Values are a function of the row index alone, so shards and workers given disjoint
+        # row ranges can never collide and no membership set has to be kept or shared.
+        start = self.next_row
+        if start + n > UNIQUE_SSN_SPACE:
+            raise ValueError(f"Unique mode supports at most {UNIQUE_SSN_SPACE} identities.")
+        self.next_row += n
+        rows = np.arange(start, start + n, dtype=np.int64)
+
+        ssn_index = self.permuted('ssn', rows)
+        serial = ssn_index % 9999 + 1
+        group = ssn_index // 9999 % 99 + 1
+        area = ssn_index // (9999 * 99) + 1
+        area += area >= 666
+        areas, groups, serials = self.ssn_areas, self.ssn_groups, self.ssn_serials
+        ssn = [areas[a] + groups[g] + serials[s] for a, g, s in zip(area.tolist(), group.tolist(), serial.tolist())]
+
+        payload = 4 * UNIQUE_CARD_SPACE + self.permuted('credit_card', rows)
+        checksum = np.zeros(n, dtype=np.int64)
+        digits = payload.copy()
+        for position in range(15):
+            # The check digit is appended on the right, so the payload's last digit gets doubled.
+            checksum += DataValidator.luhn_values[(position + 1) & 1, digits % 10]
+            digits //= 10
+        credit_card = list(map(str, (payload * 10 + (10 - checksum % 10) % 10).tolist()))
+
+        email_tag = list(map(str, self.permuted('email', rows).tolist()))
+        return email_tag, ssn, credit_card
+
+    def pool_options(self):
+        return {
+            'pool_size': self.pool_size,
+            'reuse_ratio': self.reuse_ratio,
+            'pool_memory_limit': self.pool_memory_limit,
+            'pool_file': self.pool_file
+        }
+
+    def pool_providers(self):
+        return {
+            'first_name_male': self.fake.first_name_male,
+            'first_name_female': self.fake.first_name_female,
+            'last_name': self.fake.last_name,
+            'free_email_domain': self.fake.free_email_domain,
+            'phone': self.make_phone,
+            'address': self.make_address
+        }
+
+    def build_pools(self):
+        # Faker calls dominate generate_identity, so the batch path samples each
+        # provider once up front and then fills whole columns by random index.
+        # With pool_file set, pools are loaded from disk when present and saved after a cold fill.
+        # A file is only reused when it was filled under the same settings and seed, so seeded runs
+        # get the same pools either way. Seeded runs with reuse_ratio < 1 skip the file: their fresh
+        # draws continue from the Faker state the fill leaves behind, which loading cannot restore.
+        metadata = {
+            'valid': self.valid,
+            'seed': self.seed,
+            'pool_size': self.pool_size,
+            'reuse_ratio': self.reuse_ratio,
+            'pool_memory_limit': self.pool_memory_limit
+        }
+        use_file = self.pool_file and (self.seed is None or self.reuse_ratio == 1.0)
+        if use_file and os.path.exists(self.pool_file):
+            self.value_pool = self.new_value_pool()
+            if self.value_pool.load(self.pool_file) == metadata:
+                return self.value_pool
+        self.value_pool = self.new_value_pool().fill()
+        if use_file:
+            self.value_pool.save(self.pool_file, metadata)
+        return self.value_pool
+
+    def new_value_pool(self):
+        return FakerValuePool(self.pool_providers(), self.pool_size, self.reuse_ratio, self.pool_memory_limit)
+
+    def use_pool(self, value_pool):
+        # Private copy with providers bound to this generator, so fresh draws follow its seed.
+        self.value_pool = value_pool.copy(self.pool_providers())
+
+    def sample_pool(self, name, n):
+        return self.value_pool.draw(name, n, self.rng)
+
+    def sample_dates_of_birth(self, n, minimum_age=18, maximum_age=80):
+        # Same window as Faker.date_of_birth: older than minimum_age, younger than maximum_age + 1.
+        today = date.today()
+        earliest = self._years_before(today, maximum_age + 1) + datetime.timedelta(days=1)
+        latest = self._years_before(today, minimum_age)
+        offsets = self.rng.integers(0, (latest - earliest).days + 1, n)
+        dobs = np.datetime64(earliest, 'D') + offsets
+        ages = (np.datetime64(today, 'D') - dobs).astype(np.int64) // 365
+        return dobs, ages
+
+    @staticmethod
+    def _years_before(day, years):
+        try:
+            return day.replace(year=day.year - years)
+        except ValueError:
+            return day.replace(year=day.year - years, day=28)
+
+    def random_ssns(self, n):
+        # Drawn per row in the ranges of Faker's ssn(): area 001-899 except 666, group 01-99, serial 0001-9999.
+        rng = self.rng
+        area = rng.integers(1, 899, n)
+        area += area >= 666
+        group = rng.integers(1, 100, n)
+        serial = rng.integers(1, 10000, n)
+        areas, groups, serials = self.ssn_areas, self.ssn_groups, self.ssn_serials
+        return [areas[a] + groups[g] + serials[s] for a, g, s in zip(area.tolist(), group.tolist(), serial.tolist())]
+
+    def random_credit_cards(self, n):
+        # Bare card numbers drawn per row over the same card types as make_credit_card.
+        card_types = self.valid_card_types if self.valid else list(CreditCardProvider.credit_card_types)
+        choice = self.rng.integers(0, len(card_types), n)
+        credit_card = np.empty(n, dtype=object)
+        for index, card_type in enumerate(card_types):
+            rows = np.flatnonzero(choice == index)
+            if len(rows):
+                credit_card[rows] = self.card_numbers(card_type, len(rows))
+        return credit_card.tolist()
+
+    def card_numbers(self, card_type, n):
+        # One of the type's fixed prefixes, random digits, then the Luhn check digit on the right.
+        card = CreditCardProvider.credit_card_types[card_type]
+        prefixes = [prefix for prefix in card.prefixes if prefix.isdigit()]
+        digits = self.rng.integers(0, 10, (n, card.length), dtype=np.uint8)
+        prefix_choice = self.rng.integers(0, len(prefixes), n)
+        for index, prefix in enumerate(prefixes):
+            digits[prefix_choice == index, :len(prefix)] = [int(digit) for digit in prefix]
+        doubled = (card.length - 1 - np.arange(card.length - 1)) & 1
+        checksum = DataValidator.luhn_values[doubled, digits[:, :-1]].sum(axis=1, dtype=np.int64)
+        digits[:, -1] = (10 - checksum % 10) % 10
+        return (digits + ord('0')).view(f'S{card.length}').ravel().astype(f'U{card.length}').tolist()
+
+    def generate_batch(self, n):
+        if self.value_pool is None:
+            self.build_pools()
+        rng = self.rng
+
+        is_male = rng.integers(0, 2, n) == 0
+        gender = np.where(is_male, 'Male', 'Female').astype(object)
+        first_name = np.empty(n, dtype=object)
+        first_name[is_male] = self.sample_pool('first_name_male', int(is_male.sum()))
+        first_name[~is_male] = self.sample_pool('first_name_female', n - int(is_male.sum()))
+        last_name = self.sample_pool('last_name', n)
+        dobs, ages = self.sample_dates_of_birth(n)
+        country = np.array(self.countries, dtype=object)[rng.integers(0, len(self.countries), n)]
+        ethnicity = np.array(self.ethnicities, dtype=object)[rng.integers(0, len(self.ethnicities), n)]
+        education = np.array(self.education_levels, dtype=object)[rng.integers(0, len(self.education_levels), n)]
+        occupation = np.array(self.occupations, dtype=object)[rng.integers(0, len(self.occupations), n)]
+        first_name = first_name.tolist()
+        last_name = last_name.tolist()
+        # Names come from small pools, so each distinct name is turned into a local part only once.
+        local_parts = {name: self.email_local_part(name) for name in set(first_name).union(last_name)}
+        domains = self.sample_pool('free_email_domain', n).tolist()
+        if self.unique:
+            email_tags, ssn, credit_card = self.unique_values(n)
+            email = [
+                f"{local_parts[first]}.{local_parts[last]}.{tag}@{domain}"
+                for first, last, tag, domain in zip(first_name, last_name, email_tags, domains)
+            ]
+        else:
+            # Drawn per row rather than from the pools, which would repeat them every pool_size rows.
+            credit_card = self.random_credit_cards(n)
+            ssn = self.random_ssns(n)
+            email = [
+                f"{local_parts[first]}.{local_parts[last]}@{domain}"
+                for first, last, domain in zip(first_name, last_name, domains)
+            ]
+
+        return {
+            'first_name': first_name,
+            'last_name': last_name,
+            'gender': gender.tolist(),
+            'dob': np.datetime_as_string(dobs, unit='D').tolist(),
+            'age': ages.tolist(),
+            'country': country.tolist(),
+            'ethnicity': ethnicity.tolist(),
+            'education': education.tolist(),
+            'occupation': occupation.tolist(),
+            'email': email,
+            'phone': self.sample_pool('phone', n).tolist(),
+            'address': self.sample_pool('address', n).tolist(),
+            'credit_card': credit_card,
+            'ssn': ssn
+        }
+
+def text_value(value):
+    # Text columns have no null: None is stored as '' and any other non-str value (e.g. a JSON
+    # number in a phone field) as str(value).
+    return '' if value is None else str(value)
+
+class CategoricalColumn:
+    __slots__ = ('categories', 'lookup', 'codes')
+
+    def __init__(self):
+        self.categories = []
+        self.lookup = {}
+        self.codes = array('H')
+
+    def encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            if not isinstance(value, str):
+                code = self.lookup[value] = self.encode(text_value(value))
+                return code
+            code = len(self.categories)
+            self.categories.append(value)
+            self.lookup[value] = code
+        return code
+
+    def extend(self, values):
+        lookup = self.lookup
+        self.codes.extend([lookup[value] if value in lookup else self.encode(value) for value in values])
+
+    def extend_codes(self, categories, codes):
+        remap = np.array([self.encode(value) for value in categories], dtype=np.uint16)
+        self.codes.frombytes(remap[codes].tobytes())
+
+    def truncate(self, length):
+        del self.codes[length:]
+
+    def slice(self, start, stop):
+        column = CategoricalColumn()
+        column.categories = list(self.categories)
+        column.lookup = dict(self.lookup)
+        column.codes = self.codes[start:stop]
+        return column
+
+    def extend_column(self, other):
+        remap = [self.encode(value) for value in other.categories]
+        if remap == list(range(len(remap))):
+            self.codes.extend(other.codes)
+        else:
+            self.codes.extend([remap[code] for code in other.codes])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return self.categories[self.codes[index]]
+
+    def __iter__(self):
+        return map(self.categories.__getitem__, self.codes)
+
+class IntegerColumn:
+    __slots__ = ('values',)
+
     def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.values = array('i')
+
+    def extend(self, values):
+        try:
+            self.values.extend([int(value) for value in values])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Integer column values must be whole numbers: {str(e)}")
+
+    def truncate(self, length):
+        del self.values[length:]
+
+    def slice(self, start, stop):
+        column = IntegerColumn()
+        column.values = self.values[start:stop]
+        return column
+
+    def extend_column(self, other):
+        self.values.extend(other.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __iter__(self):
+        return iter(self.values)
+
+class StringColumn:
+    # All values live in one UTF-8 buffer; offsets[i]:offsets[i + 1] delimits row i.
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def extend(self, values):
+        try:
+            encoded = [value.encode('utf-8') for value in values]
+        except AttributeError:
+            encoded = [text_value(value).encode('utf-8') for value in values]
+        offsets = accumulate(map(len, encoded), initial=self.offsets[-1])
+        next(offsets)
+        self.offsets.extend(offsets)
+        self.data += b''.join(encoded)
+
+    def truncate(self, length):
+        del self.data[self.offsets[length]:]
+        del self.offsets[length + 1:]
+
+    def extend_buffers(self, data, offsets):
+        # offsets are the int64 value offsets into data, starting at 0.
+        self.offsets.frombytes((offsets[1:] + self.offsets[-1]).astype(np.int64).tobytes())
+        self.data += data
+
+    def slice(self, start, stop):
+        column = StringColumn()
+        base = self.offsets[start]
+        column.data = self.data[base:self.offsets[stop]]
+        column.offsets = array('q', [offset - base for offset in self.offsets[start:stop + 1]])
+        return column
+
+    def extend_column(self, other):
+        base = self.offsets[-1]
+        self.offsets.extend([base + offset for offset in other.offsets[1:]])
+        self.data += other.data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def __iter__(self):
+        data = self.data
+        offsets = self.offsets
+        return (data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1))
+
+    def raw_values(self, start=0, stop=None):
+        # Undecoded (hashable) bytes of rows start:stop, for callers that only group or hash values.
+        stop = len(self) if stop is None else stop
+        data = bytes(self.data[self.offsets[start]:self.offsets[stop]])
+        base = self.offsets[start]
+        bounds = self.offsets[start:stop + 1]
+        return list(map(data.__getitem__, map(slice, [offset - base for offset in bounds[:-1]], [offset - base for offset in bounds[1:]])))
+
+class IdentityTable:
+    # Columnar replacement for a list of identity dicts: low-cardinality fields are
+    # dictionary-encoded, age is an int array and everything else is a string buffer.
+    categorical_fields = ('gender', 'country', 'ethnicity', 'education', 'occupation')
+    integer_fields = ('age',)
+    __slots__ = ('columns',)
+
+    def __init__(self, identities=None):
+        self.columns = {}
+        for field in IDENTITY_FIELDS:
+            if field in self.categorical_fields:
+                self.columns[field] = CategoricalColumn()
+            elif field in self.integer_fields:
+                self.columns[field] = IntegerColumn()
+            else:
+                self.columns[field] = StringColumn()
+        if identities is not None:
+            self.extend(identities)
+
+    def empty_like(self):
+        # New empty table sharing this table's category codes, so batches converted one after
+        # another keep compatible dictionaries.
+        table = IdentityTable()
+        for field in self.categorical_fields:
+            table.columns[field].categories = list(self.columns[field].categories)
+            table.columns[field].lookup = dict(self.columns[field].lookup)
+        return table
+
+    @classmethod
+    def from_batch(cls, batch):
+        table = cls()
+        table.extend_batch(batch)
+        return table
+
+    def extend_batch(self, batch):
+        # All or nothing: a value that fails conversion (e.g. an empty age) rolls every column back,
+        # so the columns can never end up with different lengths.
+        length = len(self)
+        try:
+            for field in IDENTITY_FIELDS:
+                self.columns[field].extend(batch[field])
+        except Exception:
+            self.truncate(length)
+            raise
+
+    def extend(self, identities, chunk_size=SHARD_SIZE):
+        length = len(self)
+        try:
+            if isinstance(identities, IdentityTable):
+                for field in IDENTITY_FIELDS:
+                    self.columns[field].extend_column(identities.columns[field])
+                return
+            identities = iter(identities)
+            while True:
+                chunk = list(islice(identities, chunk_size))
+                if not chunk:
+                    break
+                self.extend_batch({field: [identity[field] for identity in chunk] for field in IDENTITY_FIELDS})
+        except Exception:
+            self.truncate(length)
+            raise
+
+    def truncate(self, length):
+        for column in self.columns.values():
+            column.truncate(length)
+
+    def slice(self, start, stop):
+        # Columnar copy of rows start:stop, cheap to pickle for worker processes.
+        start, stop, _ = slice(start, stop).indices(len(self))
+        table = IdentityTable()
+        table.columns = {field: column.slice(start, max(start, stop)) for field, column in self.columns.items()}
+        return table
+
+    def append(self, identity):
+        self.extend_batch({field: [identity[field]] for field in IDENTITY_FIELDS})
+
+    def column(self, field):
+        return self.columns[field]
+
+    def codes(self, field):
+        return self.columns[field].codes
+
+    def categories(self, field):
+        return self.columns[field].categories
+
+    def iter_rows(self, start=0, stop=None):
+        columns = [self.columns[field] for field in IDENTITY_FIELDS]
+        if start == 0 and stop is None:
+            yield from zip(*columns)
+            return
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield tuple(column[index] for column in columns)
+
+    def __len__(self):
+        return len(self.columns['age'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IdentityTable index out of range")
+        return {field: self.columns[field][index] for field in IDENTITY_FIELDS}
+
+    def __iter__(self):
+        for row in zip(*(self.columns[field] for field in IDENTITY_FIELDS)):
+            yield dict(zip(IDENTITY_FIELDS, row))
+
+def shard_seed(seed, shard_index):
+    # Derived from (seed, shard_index) only, so a shard's rows never depend on
+    # how many workers the run was split across.
+    return int(np.random.SeedSequence(seed, spawn_key=(shard_index,)).generate_state(1)[0])
+
+def iter_shards(num_identities, shard_size=SHARD_SIZE):
+    for shard_index, start in enumerate(range(0, num_identities, shard_size)):
+        yield shard_index, min(shard_size, num_identities - start)
+
+_shard_pools = {}
+
+def generate_shard(seed, shard_index, size, vectorized=False, pool_options=None, valid=False, unique=False, row_offset=0,
+                   unique_key=0):
+    pool_options = pool_options or {}
+    generator = IdentityGenerator(seed=shard_seed(seed, shard_index), valid=valid, unique=unique, row_offset=row_offset,
+                                  unique_key=unique_key, **pool_options)
+    if not vectorized:
+        return IdentityTable([generator.generate_identity() for _ in range(size)])
+    # Every shard of a run starts from the same pools, built once per process from the master seed.
+    # Only the latest run's pools are kept, so a long-lived process holds one pool set (and stays
+    # within pool_memory_limit) however many seeds it has generated with.
+    pool_key = (seed, valid, tuple(sorted(pool_options.items())))
+    if pool_key not in _shard_pools:
+        _shard_pools.clear()
+        _shard_pools[pool_key] = IdentityGenerator(seed=seed, valid=valid, **pool_options).build_pools()
+    generator.use_pool(_shard_pools[pool_key])
+    return IdentityTable.from_batch(generator.generate_batch(size))
+
+class MachineLearningModel:
+    def __init__(self, cache_dir=None, n_jobs=-1, cache_keep=MODEL_CACHE_KEEP):
+        # With cache_dir set, fitted models are stored as model-v<version>-<key>.joblib, keyed by a
+        # hash of the training data, hyperparameters and label encodings. Only the cache_keep most
+        # recently written models are kept.
+        self.hyperparameters = {'n_estimators': 100, 'random_state': 42}
+        self.n_jobs = n_jobs
+        self.model = self.new_forest()
+        self.cache_dir = cache_dir
+        self.cache_keep = cache_keep
         self.features = ['age', 'gender', 'ethnicity', 'education', 'occupation']
         self.target = 'country'
         self.ethnicities = ['Caucasian', 'African American', 'Hispanic', 'Asian', 'Middle Eastern', 'Native American', 'Pacific Islander']
         self.education_levels = ['High School', 'Associate', 'Bachelor', 'Master', 'PhD']
         self.occupations = ['Engineer', 'Teacher', 'Doctor', 'Lawyer', 'Accountant', 'Manager', 'Salesperson', 'Artist', 'Programmer', 'Nurse']
         self.countries = ['USA', 'Canada', 'UK', 'Australia', 'Germany', 'France', 'Spain', 'Italy', 'Japan', 'Brazil']
+        self.label_encodings = {
+            'ethnicity': {value: code for code, value in enumerate(self.ethnicities)},
+            'education': {value: code for code, value in enumerate(self.education_levels)},
+            'occupation': {value: code for code, value in enumerate(self.occupations)},
+            'country': {value: code for code, value in enumerate(self.countries)}
+        }
+        self.country_labels = np.array(self.countries, dtype=object)
+        self.prediction_cache = np.full(0, -1, dtype=np.int64)
         self.is_trained = False
 
     def prepare_data(self, identities):
-        X = []
-        y = []
-        for identity in identities:
-            features = [
-                identity['age'],
-                1 if identity['gender'] == 'Male' else 0,
-                self.ethnicities.index(identity['ethnicity']),
-                self.education_levels.index(identity['education']),
-                self.occupations.index(identity['occupation'])
-            ]
-            X.append(features)
-            y.append(self.countries.index(identity['country']))
-        return np.array(X), np.array(y)
+        if isinstance(identities, IdentityTable):
+            return self.prepare_table(identities)
+        columns = self.feature_columns(identities, self.features + [self.target])
+        return self.encode_features(columns), self.encode(self.target, columns[self.target])
+
+    def prepare_table(self, table):
+        def encode(field):
+            lookup = self.encode(field, table.categories(field))
+            return lookup[np.frombuffer(table.codes(field), dtype=np.uint16)]
 
-    def train(self, X, y):
+        X = np.column_stack([
+            np.frombuffer(table.column('age').values, dtype=np.intc).astype(np.int64),
+            encode('gender'),
+            encode('ethnicity'),
+            encode('education'),
+            encode('occupation')
+        ])
+        return X, encode(self.target)
+
+    @staticmethod
+    def feature_columns(identities, fields):
+        # A columnar batch (dict of columns, as from generate_batch) is used as is; anything else
+        # is treated as an iterable of identity dicts and transposed once.
+        if isinstance(identities, Mapping):
+            return identities
+        identities = list(identities)
+        return {field: [identity[field] for identity in identities] for field in fields}
+
+    def encode(self, field, values):
+        if field == 'gender':
+            return np.fromiter((value == 'Male' for value in values), dtype=np.int64, count=len(values))
+        lookup = self.label_encodings[field]
+        try:
+            return np.fromiter(map(lookup.__getitem__, values), dtype=np.int64, count=len(values))
+        except KeyError as e:
+            raise ValueError(f"Unknown {field} value: {e.args[0]}")
+
+    def encode_features(self, columns):
+        return np.column_stack([
+            np.asarray(columns['age'], dtype=np.int64),
+            self.encode('gender', columns['gender']),
+            self.encode('ethnicity', columns['ethnicity']),
+            self.encode('education', columns['education']),
+            self.encode('occupation', columns['occupation'])
+        ])
+
+    def new_forest(self):
+        # train() always starts from the configured hyperparameters, never from the fitted model,
+        # which may be a merged train_chunks forest or a model loaded from the cache.
+        return RandomForestClassifier(n_jobs=self.n_jobs, **self.hyperparameters)
+
+    def train(self, X, y, progress=None):
         if len(X) < 2:
             raise ValueError("Not enough data to train the model. Generate more identities first.")
+        n_estimators = self.hyperparameters['n_estimators']
+        cache_file = None
+        if self.cache_dir:
+            cache_file = self.cache_file(self.cache_key(X, y))
+            if os.path.exists(cache_file) and self.load(cache_file):
+                print(f"Loaded cached model from {cache_file}")
+                if progress:
+                    progress(n_estimators, n_estimators)
+                return
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        self.model.fit(X_train, y_train)
+        # Fitted into a fresh forest that replaces self.model only once it is complete, so a failed
+        # or cancelled fit leaves the previous model in place.
+        model = self.new_forest()
+        if progress is None:
+            model.fit(X_train, y_train)
+        else:
+            # Grown a few trees at a time with warm_start, which yields the same forest as a single fit.
+            model.set_params(warm_start=True)
+            for trees in range(TRAINING_PROGRESS_TREES, n_estimators + TRAINING_PROGRESS_TREES, TRAINING_PROGRESS_TREES):
+                model.set_params(n_estimators=min(trees, n_estimators))
+                model.fit(X_train, y_train)
+                progress(min(trees, n_estimators), n_estimators)
+            model.set_params(warm_start=False)
+        self.model = model
+        self.prediction_cache = np.full(0, -1, dtype=np.int64)
         accuracy = self.model.score(X_test, y_test)
         print(f"Model accuracy: {accuracy:.2f}")
         self.is_trained = True
+        if cache_file:
+            self.save(cache_file)
+
+    def train_chunks(self, chunks, trees_per_chunk=10, test_size=0.2):
+        # Out-of-core training: every chunk fits a small sub-forest on its own rows and the trees
+        # are appended to one combined forest, so only the current chunk is held as arrays.
+        # A sub-forest can only be merged when it has seen every country, otherwise the chunk is skipped.
+        classes = np.arange(len(self.countries))
+        digest = self.cache_digest(trees_per_chunk=trees_per_chunk, test_size=test_size)
+        forest = None
+        reports = []
+        for index, chunk in enumerate(chunks):
+            X, y = self.prepare_data(chunk)
+            if len(X) < 2 or not np.array_equal(np.unique(y), classes):
+                print(f"Chunk {index}: skipped, not every country is present in its {len(X)} rows.")
+                continue
+            self.update_digest(digest, X, y)
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+            started = time.perf_counter()
+            sub_forest = RandomForestClassifier(n_estimators=trees_per_chunk, random_state=self.hyperparameters['random_state'] + index,
+                                                n_jobs=self.n_jobs)
+            sub_forest.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - started
+            if forest is None:
+                forest = sub_forest
+            else:
+                forest.estimators_ += sub_forest.estimators_
+                forest.n_estimators = len(forest.estimators_)
+            report = {
+                'chunk': index,
+                'rows': len(X),
+                'fit_seconds': fit_seconds,
+                'chunk_accuracy': sub_forest.score(X_test, y_test),
+                'accuracy': forest.score(X_test, y_test)
+            }
+            reports.append(report)
+            print(f"Chunk {index}: {report['rows']} rows, fit in {fit_seconds:.2f}s, "
+                  f"chunk accuracy {report['chunk_accuracy']:.2f}, model accuracy {report['accuracy']:.2f}")
+        if forest is None:
+            raise ValueError("Not enough data to train the model. Generate more identities first.")
+        self.model = forest
+        self.prediction_cache = np.full(0, -1, dtype=np.int64)
+        self.is_trained = True
+        if self.cache_dir:
+            self.save(self.cache_file(digest.hexdigest()[:16]))
+        return reports
+
+    def cache_digest(self, **metadata):
+        digest = hashlib.sha256()
+        digest.update(json.dumps({
+            'version': MODEL_CACHE_VERSION,
+            'hyperparameters': self.hyperparameters,
+            'label_encodings': self.label_encodings,
+            **metadata
+        }, sort_keys=True).encode('utf-8'))
+        return digest
+
+    @staticmethod
+    def update_digest(digest, X, y):
+        digest.update(np.ascontiguousarray(X, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+
+    def cache_key(self, X, y):
+        digest = self.cache_digest(shape=list(np.shape(X)))
+        self.update_digest(digest, X, y)
+        return digest.hexdigest()[:16]
+
+    def cache_file(self, key):
+        return os.path.join(self.cache_dir, f"model-v{MODEL_CACHE_VERSION}-{key}.joblib")
+
+    def save(self, filename):
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        artifact = {
+            'version': MODEL_CACHE_VERSION,
+            'hyperparameters': self.hyperparameters,
+            'label_encodings': self.label_encodings,
+            'model': self.model
+        }
+        # Written to a temporary file first so concurrent workers never load a partial model.
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        joblib.dump(artifact, temporary_filename)
+        os.replace(temporary_filename, filename)
+        if self.cache_dir:
+            self.prune_cache()
+
+    def cache_files(self):
+        # Newest first.
+        cache_files = glob.glob(os.path.join(self.cache_dir, "model-v*-*.joblib"))
+        return sorted(cache_files, key=os.path.getmtime, reverse=True)
+
+    def prune_cache(self):
+        for cache_file in self.cache_files()[self.cache_keep:]:
+            try:
+                os.remove(cache_file)
+            except OSError as e:
+                print(f"Removing cached model {cache_file} failed: {str(e)}")
+
+    def load(self, filename):
+        try:
+            artifact = joblib.load(filename)
+        except Exception as e:
+            print(f"Loading model from {filename} failed: {str(e)}")
+            return False
+        if (artifact.get('version') != MODEL_CACHE_VERSION or artifact.get('hyperparameters') != self.hyperparameters
+                or artifact.get('label_encodings') != self.label_encodings):
+            return False
+        self.model = artifact['model']
+        self.prediction_cache = np.full(0, -1, dtype=np.int64)
+        self.is_trained = True
+        return True
+
+    def load_latest(self):
+        # Newest compatible model in cache_dir, so a fresh process can predict without retraining.
+        if not self.cache_dir:
+            return False
+        for cache_file in self.cache_files():
+            if os.path.basename(cache_file).startswith(f"model-v{MODEL_CACHE_VERSION}-") and self.load(cache_file):
+                return True
+        return False
 
     def predict(self, identity):
         if not self.is_trained:
             raise Exception("Model has not been trained yet.")
         try:
-            features = [
-                identity['age'],
-                1 if identity['gender'] == 'Male' else 0,
-                self.ethnicities.index(identity['ethnicity']),
-                self.education_levels.index(identity['education']),
-                self.occupations.index(identity['occupation'])
-            ]
-            prediction = self.model.predict([features])[0]
-            return self.countries[prediction]
+            return self.predict_batch([identity])[0]
         except Exception as e:
             print(f"Prediction failed: {str(e)}")
             return None
 
+    def predict_batch(self, batch):
+        # One model call for a whole batch: a dict of columns, an IdentityTable or identity dicts.
+        if not self.is_trained:
+            raise Exception("Model has not been trained yet.")
+        if isinstance(batch, IdentityTable):
+            X = self.prepare_table(batch)[0]
+        else:
+            X = self.encode_features(self.feature_columns(batch, self.features))
+        if not len(X):
+            return []
+        return self.country_labels[self.predict_codes(X)].tolist()
+
+    def predict_codes(self, X):
+        # The feature space is small (age x gender x ethnicity x education x occupation), so each
+        # distinct row goes through the forest once and later batches are served from the cache.
+        category_dims = (2, len(self.ethnicities), len(self.education_levels), len(self.occupations))
+        keys = X[:, 0] * int(np.prod(category_dims)) + np.ravel_multi_index(X[:, 1:].T, category_dims)
+        if keys.max() >= len(self.prediction_cache):
+            grown = np.full(int(keys.max()) + 1, -1, dtype=np.int64)
+            grown[:len(self.prediction_cache)] = self.prediction_cache
+            self.prediction_cache = grown
+        uncached = self.prediction_cache[keys] < 0
+        if uncached.any():
+            missing, first = np.unique(keys[uncached], return_index=True)
+            self.prediction_cache[missing] = self.model.predict(X[uncached][first])
+        return self.prediction_cache[keys]
+
+class ConditionalDistributionEnhancer(MachineLearningModel):
+    # Drop-in alternative to the forest: empirical P(country | age band, gender, ethnicity,
+    # education, occupation) tables that are sampled rather than predicted. Every cell is smoothed
+    # toward the table with one feature fewer (dropped in backoff_order), down to the marginal
+    # country distribution, so sparse or unseen combinations fall back to what is known about them.
+    age_band_width = 10
+    age_bands = 13
+    backoff_order = (0, 1, 3, 2, 4)  # age band, gender, education, ethnicity, occupation
+
+    def __init__(self, smoothing=1.0, seed=None):
+        super().__init__()
+        self.model = None
+        self.smoothing = smoothing
+        self.rng = np.random.default_rng(seed)
+        self.category_dims = (self.age_bands, 2, len(self.ethnicities), len(self.education_levels), len(self.occupations))
+        self.counts = np.zeros((int(np.prod(self.category_dims)), len(self.countries)), dtype=np.int64)
+        self.cumulative = None
+
+    def cell_keys(self, X):
+        bands = np.clip(X[:, 0] // self.age_band_width, 0, self.age_bands - 1)
+        return np.ravel_multi_index((bands, *X[:, 1:].T), self.category_dims)
+
+    def add_counts(self, X, y):
+        cells = self.cell_keys(X) * len(self.countries) + y
+        self.counts += np.bincount(cells, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def build_tables(self):
+        levels = [self.counts.reshape(*self.category_dims, len(self.countries))]
+        for axis in self.backoff_order:
+            levels.append(levels[-1].sum(axis=axis, keepdims=True))
+        probabilities = levels[-1] / max(int(levels[-1].sum()), 1)
+        for level in reversed(levels[:-1]):
+            totals = level.sum(axis=-1, keepdims=True) + self.smoothing
+            probabilities = np.where(totals > 0, (level + self.smoothing * probabilities) / np.maximum(totals, 1e-12), probabilities)
+        self.cumulative = np.cumsum(probabilities.reshape(self.counts.shape), axis=1)
+        self.is_trained = True
+
+    def train(self, X, y, progress=None):
+        if len(X) < 2:
+            raise ValueError("Not enough data to train the model. Generate more identities first.")
+        self.counts[:] = 0
+        self.add_counts(X, y)
+        self.build_tables()
+        if progress:
+            progress(1, 1)
+        print(f"Conditional tables built from {len(X)} identities.")
+
+    def train_chunks(self, chunks, trees_per_chunk=10, test_size=0.2):
+        # Counts are additive, so chunks are simply accumulated; the forest options are ignored.
+        self.counts[:] = 0
+        reports = []
+        for index, chunk in enumerate(chunks):
+            X, y = self.prepare_data(chunk)
+            started = time.perf_counter()
+            self.add_counts(X, y)
+            report = {'chunk': index, 'rows': len(X), 'fit_seconds': time.perf_counter() - started}
+            reports.append(report)
+            print(f"Chunk {index}: {report['rows']} rows, counted in {report['fit_seconds']:.2f}s")
+        if self.counts.sum() < 2:
+            raise ValueError("Not enough data to train the model. Generate more identities first.")
+        self.build_tables()
+        return reports
+
+    def predict_codes(self, X):
+        cumulative = self.cumulative[self.cell_keys(X)]
+        draws = self.rng.random(len(X))
+        return np.minimum((cumulative < draws[:, None]).sum(axis=1), len(self.countries) - 1)
+
 class DataValidator:
+    email_pattern = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+    phone_pattern = re.compile(r'^\+?1?\d{9,15}$')
+    rules = ('age', 'email', 'phone', 'credit_card')
+    # Luhn contribution of a digit: row 0 as is, row 1 doubled (minus 9 for two-digit results).
+    luhn_values = np.array([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [0, 2, 4, 6, 8, 1, 3, 5, 7, 9]], dtype=np.uint8)
+    max_card_length = 19
+
     @staticmethod
     def validate_age(age):
         return isinstance(age, int) and 18 <= age <= 100
 
     @staticmethod
     def validate_email(email):
-        pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-        return isinstance(email, str) and re.match(pattern, email) is not None
+        return isinstance(email, str) and DataValidator.email_pattern.match(email) is not None
 
     @staticmethod
     def validate_phone(phone):
-        pattern = r'^\+?1?\d{9,15}$'
-        return isinstance(phone, str) and re.match(pattern, phone) is not None
+        return isinstance(phone, str) and DataValidator.phone_pattern.match(phone) is not None
 
     @staticmethod
     def validate_credit_card(cc_number):
@@ -137,103 +1274,739 @@ class DataValidator:
             checksum += digit
         return checksum % 10 == 0
 
+    @staticmethod
+    def validate_pattern_column(pattern, values):
+        match = pattern.match
+        if isinstance(values, StringColumn):
+            return np.fromiter(map(bool, map(match, values)), dtype=bool, count=len(values))
+        return np.fromiter((isinstance(value, str) and match(value) is not None for value in values), dtype=bool)
+
+    @staticmethod
+    def validate_age_column(ages):
+        if isinstance(ages, IntegerColumn):
+            ages = np.frombuffer(ages.values, dtype=np.intc)
+            return (ages >= 18) & (ages <= 100)
+        return np.fromiter((DataValidator.validate_age(age) for age in ages), dtype=bool)
+
+    @staticmethod
+    def validate_credit_card_column(cc_numbers):
+        # Luhn over the whole column at once, straight on the UTF-8 buffer of a StringColumn:
+        # each ASCII digit's rank from the right of its row decides whether it is doubled.
+        if isinstance(cc_numbers, StringColumn):
+            column = cc_numbers
+            is_string = True
+        else:
+            cc_numbers = list(cc_numbers)
+            is_string = np.fromiter((isinstance(cc_number, str) for cc_number in cc_numbers), dtype=bool)
+            column = StringColumn()
+            column.extend([cc_number if isinstance(cc_number, str) else '' for cc_number in cc_numbers])
+        data = np.frombuffer(column.data, dtype=np.uint8)
+        offsets = np.frombuffer(column.offsets, dtype=np.int64)
+        positions = np.flatnonzero((data >= ord('0')) & (data <= ord('9')))
+        digits = data[positions] - ord('0')
+        # Number of digits before each row boundary, i.e. where each row's digits start and end.
+        digits_before = np.searchsorted(positions, offsets)
+        digit_counts = np.diff(digits_before)
+        rows = np.repeat(np.arange(len(column)), digit_counts)
+        rank_from_right = digits_before[1:][rows] - 1 - np.arange(len(digits))
+        values = DataValidator.luhn_values[rank_from_right & 1, digits]
+        checksum = np.bincount(rows, weights=values, minlength=len(column)).astype(np.int64)
+        in_range = (digit_counts >= 13) & (digit_counts <= DataValidator.max_card_length)
+        return in_range & (checksum % 10 == 0) & is_string
+
+    @staticmethod
+    def validate_batch(identities):
+        # Returns ({rule: bool mask, ..., 'valid': combined mask}, report) for a table or a list of identities.
+        if isinstance(identities, IdentityTable):
+            column = identities.column
+        else:
+            identities = identities if isinstance(identities, list) else list(identities)
+            column = lambda field: [identity[field] for identity in identities]
+        masks = {
+            'age': DataValidator.validate_age_column(column('age')),
+            'email': DataValidator.validate_pattern_column(DataValidator.email_pattern, column('email')),
+            'phone': DataValidator.validate_pattern_column(DataValidator.phone_pattern, column('phone')),
+            'credit_card': DataValidator.validate_credit_card_column(column('credit_card'))
+        }
+        valid = np.ones(len(identities), dtype=bool)
+        for rule in DataValidator.rules:
+            valid &= masks[rule]
+        masks['valid'] = valid
+        report = {
+            'total': len(identities),
+            'valid': int(valid.sum()),
+            'failures': {rule: int(len(identities) - masks[rule].sum()) for rule in DataValidator.rules}
+        }
+        return masks, report
+
+class ValidationReport:
+    # Dataset-level validation result: for every rule, the sorted row indices that failed it.
+    # Saved as a compressed .npz next to the data so repair jobs can load just the bad rows.
+    def __init__(self, total=0, failures=None):
+        self.total = total
+        self.failures = failures if failures is not None else {
+            rule: np.empty(0, dtype=np.int64) for rule in DataValidator.rules
+        }
+
+    def failure_counts(self):
+        return {rule: len(indices) for rule, indices in self.failures.items()}
+
+    def invalid_rows(self):
+        return np.unique(np.concatenate(list(self.failures.values())))
+
+    def summary(self):
+        return {
+            'total': self.total,
+            'valid': self.total - len(self.invalid_rows()),
+            'failures': self.failure_counts()
+        }
+
+    def save(self, filename):
+        np.savez_compressed(filename, total=np.int64(self.total), **self.failures)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            return cls(int(data['total']), {rule: data[rule] for rule in data.files if rule != 'total'})
+
+def validate_chunk(identities, start_index):
+    masks, _ = DataValidator.validate_batch(identities)
+    return {rule: np.flatnonzero(~masks[rule]) + start_index for rule in DataValidator.rules}
+
 class IdentityEncryptor:
-    def __init__(self):
-        self.key = Fernet.generate_key()
+    # Encryption modes:
+    #   'field'  - one Fernet token per field (14 tokens per identity, ~4x the plaintext JSON size).
+    #   'record' - one token per identity wrapped in a {'record': token} envelope. Fernet adds a
+    #              fixed 57-byte header/HMAC plus padding and base64, so ~1.5x the plaintext size,
+    #              and it runs ~7x faster than 'field' mode (~25k identities/s per core).
+    # With workers > 1, chunks are encrypted in a process pool; the target for record mode is
+    # >= 150k identities/s on 8 workers.
+    # encrypted_fields is the encryption policy: None encrypts every field, otherwise only the
+    # listed fields are encrypted and the rest stay in plaintext (e.g. SENSITIVE_FIELDS).
+    modes = ('field', 'record')
+
+    def __init__(self, key=None, encrypted_fields=None):
+        self.key = key if key is not None else Fernet.generate_key()
         self.fernet = Fernet(self.key)
+        self.encrypted_fields = None if encrypted_fields is None else frozenset(encrypted_fields)
+
+    @classmethod
+    def from_key_file(cls, filename, encrypted_fields=None):
+        # Reads the key from filename, or creates the file with a new key (readable by the owner
+        # only) when it does not exist yet, so later processes can decrypt what this one exports.
+        if os.path.exists(filename):
+            with open(filename, 'rb') as keyfile:
+                return cls(keyfile.read().strip(), encrypted_fields)
+        encryptor = cls(encrypted_fields=encrypted_fields)
+        encryptor.save_key(filename)
+        return encryptor
+
+    def save_key(self, filename):
+        with os.fdopen(os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as keyfile:
+            keyfile.write(self.key)
+
+    def is_encrypted_field(self, field):
+        return self.encrypted_fields is None or field in self.encrypted_fields
+
+    def encrypt_value(self, value):
+        return self.fernet.encrypt(json.dumps(value).encode()).decode()
+
+    def decrypt_value(self, token):
+        return json.loads(self.fernet.decrypt(token.encode()).decode())
 
     def encrypt_identity(self, identity):
         encrypted_identity = {}
         for key, value in identity.items():
-            encrypted_value = self.fernet.encrypt(json.dumps(value).encode())
-            encrypted_identity[key] = encrypted_value.decode()
+            encrypted_identity[key] = self.encrypt_value(value) if self.is_encrypted_field(key) else value
         return encrypted_identity
 
+    def encrypt_record(self, identity):
+        envelope = {}
+        sensitive = {}
+        for key, value in identity.items():
+            if self.is_encrypted_field(key):
+                sensitive[key] = value
+            else:
+                envelope[key] = value
+        plaintext = json.dumps(sensitive, ensure_ascii=False, separators=(',', ':')).encode()
+        envelope[RECORD_ENVELOPE_FIELD] = self.fernet.encrypt(plaintext).decode()
+        return envelope
+
+    def decrypt_record(self, envelope):
+        identity = {key: value for key, value in envelope.items() if key != RECORD_ENVELOPE_FIELD}
+        identity.update(json.loads(self.fernet.decrypt(envelope[RECORD_ENVELOPE_FIELD].encode())))
+        ordered = {field: identity.pop(field) for field in IDENTITY_FIELDS if field in identity}
+        ordered.update(identity)
+        return ordered
+
+    def decrypt_chunk(self, encrypted_identities, start_index=0):
+        # Returns (decrypted identities, [(index, error), ...]); a bad record never aborts the chunk.
+        decrypted_identities = []
+        failures = []
+        for index, encrypted_identity in enumerate(encrypted_identities, start_index):
+            try:
+                decrypted_identities.append(self.decrypt_identity(encrypted_identity))
+            except Exception as e:
+                failures.append((index, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__))
+        return decrypted_identities, failures
+
+    def iter_decrypt(self, encrypted_identities, workers=1, chunk_size=ENCRYPTION_CHUNK_SIZE, progress=None):
+        # progress(done, total) is reported after every decrypted chunk; total is None for streams.
+        total = len(encrypted_identities) if isinstance(encrypted_identities, Sized) else None
+        rows = iter(encrypted_identities)
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+        done = 0
+        if workers <= 1:
+            for chunk in chunks:
+                yield self.decrypt_chunk(chunk, done)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_encryption_worker,
+                                 initargs=(self.key, self.encrypted_fields)) as executor:
+            pending = deque()
+            start_index = 0
+            try:
+                for chunk in chunks:
+                    pending.append((executor.submit(decrypt_worker_chunk, chunk, start_index), len(chunk)))
+                    start_index += len(chunk)
+                    if len(pending) >= 2 * workers:
+                        future, size = pending.popleft()
+                        yield future.result()
+                        done += size
+                        if progress:
+                            progress(done, total)
+                while pending:
+                    future, size = pending.popleft()
+                    yield future.result()
+                    done += size
+                    if progress:
+                        progress(done, total)
+            except OperationCancelled:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    def wrap(self, encrypted_identity):
+        return EncryptedIdentity(self, encrypted_identity)
+
+    def encrypt_chunk(self, identities, mode='field'):
+        encrypt = self.encrypt_record if mode == 'record' else self.encrypt_identity
+        return [encrypt(identity) for identity in identities]
+
+    def encrypt_identities(self, identities, mode='field', workers=1, chunk_size=ENCRYPTION_CHUNK_SIZE, progress=None):
+        if mode not in self.modes:
+            raise ValueError(f"Invalid encryption mode '{mode}'. Choose one of: {', '.join(self.modes)}.")
+        if workers <= 1 and progress is None:
+            return self.encrypt_chunk(identities, mode)
+        total = len(identities) if isinstance(identities, Sized) else None
+        rows = iter(identities)
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+        encrypted_identities = []
+        if workers <= 1:
+            for chunk in chunks:
+                encrypted_identities.extend(self.encrypt_chunk(chunk, mode))
+                progress(len(encrypted_identities), total)
+            return encrypted_identities
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_encryption_worker,
+                                 initargs=(self.key, self.encrypted_fields)) as executor:
+            try:
+                for encrypted_chunk in executor.map(encrypt_worker_chunk, chunks, repeat(mode)):
+                    encrypted_identities.extend(encrypted_chunk)
+                    if progress:
+                        progress(len(encrypted_identities), total)
+            except OperationCancelled:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        return encrypted_identities
+
     def decrypt_identity(self, encrypted_identity):
+        if RECORD_ENVELOPE_FIELD in encrypted_identity:
+            return self.decrypt_record(encrypted_identity)
         decrypted_identity = {}
         for key, value in encrypted_identity.items():
-            decrypted_value = json.loads(self.fernet.decrypt(value.encode()).decode())
-            decrypted_identity[key] = decrypted_value
+            decrypted_identity[key] = self.decrypt_value(value) if self.is_encrypted_field(key) else value
         return decrypted_identity
 
+class EncryptedIdentity(Mapping):
+    # Read-only view of an encrypted identity that decrypts a field the first time it is read.
+    # Plaintext fields cost no crypto at all; a record envelope is decrypted once for all its fields.
+    __slots__ = ('encryptor', 'encrypted_identity', 'cache')
+
+    def __init__(self, encryptor, encrypted_identity):
+        self.encryptor = encryptor
+        self.encrypted_identity = encrypted_identity
+        self.cache = {}
+
+    def __getitem__(self, field):
+        if field in self.cache:
+            return self.cache[field]
+        encrypted_identity = self.encrypted_identity
+        if RECORD_ENVELOPE_FIELD in encrypted_identity:
+            if field in encrypted_identity and field != RECORD_ENVELOPE_FIELD:
+                return encrypted_identity[field]
+            self.cache.update(self.encryptor.decrypt_record(encrypted_identity))
+            return self.cache[field]
+        value = encrypted_identity[field]
+        if self.encryptor.is_encrypted_field(field):
+            value = self.cache[field] = self.encryptor.decrypt_value(value)
+        return value
+
+    def _fields(self):
+        encrypted_identity = self.encrypted_identity
+        if RECORD_ENVELOPE_FIELD not in encrypted_identity:
+            return list(encrypted_identity)
+        if self.encryptor.encrypted_fields is None:
+            return list(self.encryptor.decrypt_record(encrypted_identity))
+        fields = set(encrypted_identity).union(self.encryptor.encrypted_fields)
+        fields.discard(RECORD_ENVELOPE_FIELD)
+        ordered = [field for field in IDENTITY_FIELDS if field in fields]
+        return ordered + sorted(fields.difference(ordered))
+
+    def __iter__(self):
+        return iter(self._fields())
+
+    def __len__(self):
+        return len(self._fields())
+
+_worker_encryptor = None
+
+def init_encryption_worker(key, encrypted_fields=None):
+    global _worker_encryptor
+    _worker_encryptor = IdentityEncryptor(key, encrypted_fields)
+
+def encrypt_worker_chunk(identities, mode):
+    return _worker_encryptor.encrypt_chunk(identities, mode)
+
+def decrypt_worker_chunk(encrypted_identities, start_index):
+    return _worker_encryptor.decrypt_chunk(encrypted_identities, start_index)
+
 class IdentityAnalyzer:
-    def __init__(self, identities):
-        self.identities = identities
+    # Keeps running counters that are updated as identities are appended, so every query
+    # costs O(distinct values) instead of a pass over the whole dataset. Age is a bounded
+    # integer, so an age histogram gives the exact median.
+    def __init__(self, identities=None):
+        self.count = 0
+        self.age_total = 0
+        self.age_counts = Counter()
+        self.gender_counts = Counter()
+        self.country_counts = Counter()
+        self.first_name_counts = Counter()
+        self.last_name_counts = Counter()
+        if identities is not None:
+            self.update(identities)
+
+    def update(self, identities):
+        if isinstance(identities, IdentityTable):
+            self._update_table(identities)
+            return
+        for identity in identities:
+            age = int(identity['age'])
+            self.count += 1
+            self.age_total += age
+            self.age_counts[age] += 1
+            self.gender_counts[identity['gender']] += 1
+            self.country_counts[identity['country']] += 1
+            self.first_name_counts[identity['first_name']] += 1
+            self.last_name_counts[identity['last_name']] += 1
+
+    def _update_table(self, table):
+        ages = np.frombuffer(table.column('age').values, dtype=np.intc)
+        self.count += len(ages)
+        self.age_total += int(ages.sum(dtype=np.int64))
+        values, counts = np.unique(ages, return_counts=True)
+        self.age_counts.update(dict(zip(values.tolist(), counts.tolist())))
+        for field, field_counts in (('gender', self.gender_counts), ('country', self.country_counts)):
+            codes = np.frombuffer(table.codes(field), dtype=np.uint16)
+            counts = np.bincount(codes, minlength=len(table.categories(field))).tolist()
+            field_counts.update({category: count for category, count in zip(table.categories(field), counts) if count})
+        self.first_name_counts.update(table.column('first_name'))
+        self.last_name_counts.update(table.column('last_name'))
+
+    def _distribution(self, counts):
+        return {value: count / self.count for value, count in counts.items()}
 
     def get_age_distribution(self):
-        ages = [identity['age'] for identity in self.identities]
+        if not self.count:
+            raise ValueError("No identities to analyze.")
+        median_position = self.count // 2
+        seen = 0
+        for age in sorted(self.age_counts):
+            seen += self.age_counts[age]
+            if seen > median_position:
+                median = age
+                break
         return {
-            'mean': sum(ages) / len(ages),
-            'median': sorted(ages)[len(ages) // 2],
-            'min': min(ages),
-            'max': max(ages)
+            'mean': self.age_total / self.count,
+            'median': median,
+            'min': min(self.age_counts),
+            'max': max(self.age_counts)
         }
 
     def get_gender_distribution(self):
-        genders = [identity['gender'] for identity in self.identities]
-        return {gender: genders.count(gender) / len(genders) for gender in set(genders)}
+        return self._distribution(self.gender_counts)
 
     def get_country_distribution(self):
-        countries = [identity['country'] for identity in self.identities]
-        return {country: countries.count(country) / len(countries) for country in set(countries)}
+        return self._distribution(self.country_counts)
 
     def get_most_common_names(self, n=10):
-        first_names = [identity['first_name'] for identity in self.identities]
-        last_names = [identity['last_name'] for identity in self.identities]
-        
         return {
-            'first_names': dict(Counter(first_names).most_common(n)),
-            'last_names': dict(Counter(last_names).most_common(n))
+            'first_names': dict(self.first_name_counts.most_common(n)),
+            'last_names': dict(self.last_name_counts.most_common(n))
         }
 
+class IdentitySearchIndex:
+    # Incremental search over an IdentityTable. Names are indexed per distinct lowercased first
+    # and last name (row postings in array('I')), so a substring query scans the name vocabulary
+    # instead of every row. Email and SSN are matched through an array of their hashes, and
+    # country through the table's category codes. A lock lets one thread add rows while another searches.
+    # Searches copy what they read into numpy inside the lock: a view (np.frombuffer) of a postings,
+    # hash or code array would pin its buffer past the lock, and update() could not extend it.
+    exact_fields = ('email', 'ssn')
+
+    def __init__(self, table):
+        self.table = table
+        self.count = 0
+        self.first_names = {}
+        self.last_names = {}
+        self.hashes = {field: array('q') for field in self.exact_fields}
+        self.lock = threading.Lock()
+
+    def update(self):
+        # Indexes only the rows appended to the table since the last call.
+        with self.lock:
+            start, stop = self.count, len(self.table)
+            if start == stop:
+                return
+            for field, postings in (('first_name', self.first_names), ('last_name', self.last_names)):
+                groups = {}
+                for row, name in enumerate(self.table.column(field).raw_values(start, stop), start):
+                    rows = groups.get(name)
+                    if rows is None:
+                        groups[name] = [row]
+                    else:
+                        rows.append(row)
+                # Names repeat a lot, so decoding, lowercasing and the postings lookup happen once per distinct name.
+                for name, rows in groups.items():
+                    name = name.decode('utf-8').lower()
+                    if name not in postings:
+                        postings[name] = array('I')
+                    postings[name].extend(rows)
+            for field in self.exact_fields:
+                self.hashes[field].extend(map(hash, self.table.column(field).raw_values(start, stop)))
+            self.count = stop
+
+    def query(self, text, limit=SEARCH_RESULT_LIMIT):
+        # "country:UK", "email:..." and "ssn:..." select a field; bare emails and SSNs are
+        # recognized by their shape, and anything else is a name substring.
+        text = text.strip()
+        field, separator, value = text.partition(':')
+        if separator and field.lower() in ('country',) + self.exact_fields:
+            return self.exact(field.lower(), value.strip(), limit)
+        if '@' in text:
+            return self.exact('email', text, limit)
+        if SSN_PATTERN.match(text):
+            return self.exact('ssn', text, limit)
+        return self.search(text, limit)
+
+    def search(self, term, limit=SEARCH_RESULT_LIMIT):
+        # Row ids (ascending, at most limit) whose "first last" contains term, case-insensitively.
+        term = term.lower()
+        with self.lock:
+            if not term:
+                return list(range(min(limit, self.count)))
+            matches = [
+                np.array(rows, dtype=np.uint32)
+                for name, rows in chain(self.first_names.items(), self.last_names.items()) if term in name
+            ]
+            # Postings are ascending, so a list with at least limit rows bounds the answer by its
+            # limit-th row; every list is cut at that bound before the union.
+            bound = min((int(postings[limit - 1]) for postings in matches if len(postings) >= limit), default=None)
+            if bound is not None:
+                matches = [postings[:np.searchsorted(postings, bound, side='right')] for postings in matches]
+            rows = matches
+            head, space, tail = term.partition(' ')
+            if space:
+                # A term with a space can also span the two names: "ohn sm" matches "John Smith".
+                first_rows = self._rows(name_rows for name, name_rows in self.first_names.items() if name.endswith(head))
+                last_rows = self._rows(name_rows for name, name_rows in self.last_names.items() if name.startswith(tail))
+                rows.append(np.intersect1d(first_rows, last_rows, assume_unique=True)[:limit])
+        if not rows:
+            return []
+        return np.unique(np.concatenate(rows))[:limit].tolist()
+
+    @staticmethod
+    def _rows(postings):
+        arrays = [np.array(rows, dtype=np.uint32) for rows in postings]
+        return np.unique(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.uint32)
+
+    def exact(self, field, value, limit=SEARCH_RESULT_LIMIT):
+        with self.lock:
+            count = self.count
+            if field == 'country':
+                categories = self.table.categories(field)
+                lowered = [category.lower() for category in categories]
+                if value.lower() not in lowered:
+                    return []
+                codes = np.array(self.table.codes(field)[:count], dtype=np.uint16)
+                return np.flatnonzero(codes == lowered.index(value.lower()))[:limit].tolist()
+            hashes = np.array(self.hashes[field], dtype=np.int64)
+            column = self.table.column(field)
+            # Hash hits are confirmed against the stored value to rule out collisions.
+            candidates = np.flatnonzero(hashes == hash(value.encode('utf-8'))).tolist()
+            return [row for row in candidates if column[row] == value][:limit]
+
+def open_text_file(filename, mode='r', compression=None):
+    # compression is 'gzip', 'zstd' or None; by default it is inferred from the extension.
+    if compression is None:
+        if filename.endswith('.gz'):
+            compression = 'gzip'
+        elif filename.endswith('.zst'):
+            compression = 'zstd'
+    if compression == 'gzip':
+        return gzip.open(filename, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package.")
+        return zstandard.open(filename, mode + 't', encoding='utf-8')
+    if compression is not None:
+        raise ValueError(f"Unsupported compression '{compression}'. Choose 'gzip' or 'zstd'.")
+    return open(filename, mode, encoding='utf-8', buffering=JSONL_BUFFER_SIZE)
+
 class IdentityExporter:
     @staticmethod
-    def export_to_csv(identities, filename):
+    def iter_rows(identities):
+        if isinstance(identities, IdentityTable):
+            return identities.iter_rows()
+        return (tuple(identity[field] for field in IDENTITY_FIELDS) for identity in identities)
+
+    @staticmethod
+    def iter_chunks(items, chunk_size, progress=None, total=None):
+        # Lists of up to chunk_size items; progress(done, total) is reported once a chunk has been written.
+        done = 0
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+    @staticmethod
+    def json_object(fields, values):
+        members = ',\n        '.join(
+            f"{json.dumps(field)}: {json.dumps(value, ensure_ascii=False)}" for field, value in zip(fields, values)
+        )
+        return '{\n        ' + members + '\n    }'
+
+    @staticmethod
+    def export_to_csv(identities, filename, progress=None):
+        if isinstance(identities, IdentityTable):
+            if not identities:
+                raise ValueError("No identities to export.")
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(IDENTITY_FIELDS)
+                for chunk in IdentityExporter.iter_chunks(identities.iter_rows(), PROGRESS_INTERVAL, progress, len(identities)):
+                    writer.writerows(chunk)
+            return
+        # identities may be any iterable (e.g. a chained iter_identities stream), so peek for the header.
+        identities = iter(identities)
+        first_identity = next(identities, None)
+        if first_identity is None:
+            raise ValueError("No identities to export.")
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = identities[0].keys()
+            fieldnames = first_identity.keys()
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
+            writer.writerow(first_identity)
             for identity in identities:
                 writer.writerow(identity)
 
     @staticmethod
-    def export_to_json(identities, filename):
+    def export_to_json(identities, filename, progress=None):
+        # Written item by item with the same layout as json.dump(..., indent=4) so streams never get materialized.
         with open(filename, 'w', encoding='utf-8') as jsonfile:
-            json.dump(identities, jsonfile, indent=4, ensure_ascii=False)
+            total = None
+            if isinstance(identities, IdentityTable):
+                items = (IdentityExporter.json_object(IDENTITY_FIELDS, row) for row in identities.iter_rows())
+                total = len(identities)
+            else:
+                items = (json.dumps(identity, indent=4, ensure_ascii=False).replace('\n', '\n    ') for identity in identities)
+            separator = '[\n    '
+            for chunk in IdentityExporter.iter_chunks(items, PROGRESS_INTERVAL, progress, total):
+                for item in chunk:
+                    jsonfile.write(separator)
+                    jsonfile.write(item)
+                    separator = ',\n    '
+            jsonfile.write('[]' if separator == '[\n    ' else '\n]')
 
     @staticmethod
-    def export_to_sql(identities, db_name):
-        conn = sqlite3.connect(db_name)
+    def export_to_sql(identities, db_name, mode='append', chunk_size=SQL_CHUNK_SIZE,
+                      journal_mode=None, synchronous=None, create_indexes=True, conflict_key=None, progress=None):
+        # journal_mode and synchronous are opt-in (e.g. 'WAL' and 'NORMAL' for the fastest bulk load).
+        # A journal mode such as WAL stays with the database file, so by default the file is left as it is.
+        # mode='upsert' updates rows whose conflict_key column matches an incoming identity. The key
+        # has to be given explicitly: batch-generated SSNs and emails are only unique when the system
+        # runs with unique_identities=True, and upserting on a repeating key collapses rows.
+        if mode not in SQL_EXPORT_MODES:
+            raise ValueError(f"Invalid SQL export mode '{mode}'. Choose one of: {', '.join(SQL_EXPORT_MODES)}.")
+        if mode == 'upsert' and conflict_key not in IDENTITY_FIELDS:
+            raise ValueError(f"Upsert needs a conflict_key column, one of: {', '.join(IDENTITY_FIELDS)}.")
+        if journal_mode is not None and journal_mode.upper() not in SQL_JOURNAL_MODES:
+            raise ValueError(f"Invalid journal_mode '{journal_mode}'.")
+        if synchronous is not None and synchronous.upper() not in SQL_SYNCHRONOUS_MODES:
+            raise ValueError(f"Invalid synchronous setting '{synchronous}'.")
+
+        # Autocommit mode, so every chunk below runs inside an explicit BEGIN/COMMIT.
+        conn = sqlite3.connect(db_name, isolation_level=None)
         c = conn.cursor()
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS identities
-                     (id INTEGER PRIMARY KEY,
-                      first_name TEXT,
-                      last_name TEXT,
-                      gender TEXT,
-                      dob DATE,
-                      age INTEGER,
-                      country TEXT,
-                      ethnicity TEXT,
-                      education TEXT,
-                      occupation TEXT,
-                      email TEXT,
-                      phone TEXT,
-                      address TEXT,
-                      credit_card TEXT,
-                      ssn TEXT)''')
-        
-        for identity in identities:
-            c.execute('''INSERT INTO identities
-                         (first_name, last_name, gender, dob, age, country, ethnicity, education, occupation, email, phone, address, credit_card, ssn)
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                      (identity['first_name'], identity['last_name'], identity['gender'], identity['dob'],
-                       identity['age'], identity['country'], identity['ethnicity'], identity['education'],
-                       identity['occupation'], identity['email'], identity['phone'], identity['address'],
-                       identity['credit_card'], identity['ssn']))
-        
-        conn.commit()
-        conn.close()
+        try:
+            if journal_mode is not None:
+                c.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+            if synchronous is not None:
+                c.execute(f"PRAGMA synchronous={synchronous.upper()}")
+            if mode == 'replace':
+                c.execute("DROP TABLE IF EXISTS identities")
+
+            c.execute('''CREATE TABLE IF NOT EXISTS identities
+                         (id INTEGER PRIMARY KEY,
+                          first_name TEXT,
+                          last_name TEXT,
+                          gender TEXT,
+                          dob DATE,
+                          age INTEGER,
+                          country TEXT,
+                          ethnicity TEXT,
+                          education TEXT,
+                          occupation TEXT,
+                          email TEXT,
+                          phone TEXT,
+                          address TEXT,
+                          credit_card TEXT,
+                          ssn TEXT)''')
+
+            insert = f"INSERT INTO identities ({', '.join(IDENTITY_FIELDS)}) VALUES ({', '.join('?' * len(IDENTITY_FIELDS))})"
+            if mode == 'upsert':
+                # ON CONFLICT needs the unique index up front, which an existing table can only get
+                # when its conflict_key values are distinct already.
+                duplicate = c.execute(f"SELECT {conflict_key} FROM identities GROUP BY {conflict_key} "
+                                      f"HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+                if duplicate:
+                    raise ValueError(f"Cannot upsert on {conflict_key}: the existing table already holds "
+                                     f"duplicate values (e.g. {duplicate[0]!r}).")
+                c.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_identities_{conflict_key}_unique ON identities ({conflict_key})")
+                updates = ', '.join(f"{field} = excluded.{field}" for field in IDENTITY_FIELDS if field != conflict_key)
+                insert += f" ON CONFLICT({conflict_key}) DO UPDATE SET {updates}"
+            elif create_indexes and c.execute("SELECT NOT EXISTS (SELECT 1 FROM identities)").fetchone()[0]:
+                # Maintaining secondary indexes row by row is slower than building them once after the
+                # load. That only pays off when the table starts empty; a small append to a large table
+                # keeps its indexes. Only dropped when they are rebuilt below.
+                for name, _ in SQL_INDEXES:
+                    c.execute(f"DROP INDEX IF EXISTS {name}")
+
+            total = len(identities) if isinstance(identities, IdentityTable) else None
+            for chunk in IdentityExporter.iter_chunks(IdentityExporter.iter_rows(identities), chunk_size, progress, total):
+                c.execute("BEGIN")
+                try:
+                    c.executemany(insert, chunk)
+                except Exception:
+                    c.execute("ROLLBACK")
+                    raise
+                c.execute("COMMIT")
+
+            if create_indexes:
+                c.execute("BEGIN")
+                for name, column in SQL_INDEXES:
+                    c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON identities ({column})")
+                c.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def export_to_jsonl(identities, filename, compression=None, append=False, chunk_size=SHARD_SIZE, progress=None):
+        # One identity per line; append=True resumes an interrupted export by adding to the existing file.
+        total = None
+        if isinstance(identities, IdentityTable):
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            lines = (encode(dict(zip(IDENTITY_FIELDS, row))) + '\n' for row in identities.iter_rows())
+            total = len(identities)
+        else:
+            lines = (json.dumps(identity, ensure_ascii=False) + '\n' for identity in identities)
+        with open_text_file(filename, 'a' if append else 'w', compression) as jsonlfile:
+            for chunk in IdentityExporter.iter_chunks(lines, chunk_size, progress, total):
+                jsonlfile.writelines(chunk)
+
+    @staticmethod
+    def to_record_batch(table):
+        if pa is None:
+            raise ImportError("Arrow/Parquet export requires the 'pyarrow' package.")
+        arrays = []
+        for field in IDENTITY_FIELDS:
+            column = table.column(field)
+            if field in IdentityTable.categorical_fields:
+                indices = pa.array(np.frombuffer(column.codes, dtype=np.uint16).astype(np.int32))
+                arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(column.categories, pa.string())))
+            elif field in IdentityTable.integer_fields:
+                arrays.append(pa.array(np.frombuffer(column.values, dtype=np.intc).astype(np.int16)))
+            elif field == 'dob':
+                arrays.append(pa.array(np.array(list(column), dtype='datetime64[D]')))
+            else:
+                # Copies of the buffers: exporting the live ones would pin them and block further appends.
+                arrays.append(pa.LargeStringArray.from_buffers(
+                    len(column), pa.py_buffer(column.offsets.tobytes()), pa.py_buffer(bytes(column.data))
+                ))
+        return pa.record_batch(arrays, names=IDENTITY_FIELDS)
+
+    @staticmethod
+    def iter_record_batches(identities, row_group_size=ARROW_ROW_GROUP_SIZE, progress=None):
+        if isinstance(identities, IdentityTable):
+            batch = IdentityExporter.to_record_batch(identities)
+            for offset in range(0, batch.num_rows, row_group_size):
+                yield batch.slice(offset, row_group_size)
+                if progress:
+                    progress(min(offset + row_group_size, batch.num_rows), batch.num_rows)
+            return
+        rows = iter(identities)
+        chunk_table = IdentityTable()
+        while True:
+            chunk = list(islice(rows, row_group_size))
+            if not chunk:
+                break
+            chunk_table = chunk_table.empty_like()
+            chunk_table.extend(chunk)
+            yield IdentityExporter.to_record_batch(chunk_table)
+
+    @staticmethod
+    def export_to_parquet(identities, filename, row_group_size=ARROW_ROW_GROUP_SIZE, compression='zstd', progress=None):
+        writer = None
+        try:
+            for batch in IdentityExporter.iter_record_batches(identities, row_group_size, progress):
+                if writer is None:
+                    writer = pq.ParquetWriter(filename, batch.schema, compression=compression)
+                writer.write_batch(batch, row_group_size=row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("No identities to export.")
+
+    @staticmethod
+    def export_to_arrow(identities, filename, row_group_size=ARROW_ROW_GROUP_SIZE, progress=None):
+        writer = None
+        # Dictionaries only ever grow between batches, which the IPC file format accepts as deltas.
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True) if pa is not None else None
+        try:
+            for batch in IdentityExporter.iter_record_batches(identities, row_group_size, progress):
+                if writer is None:
+                    writer = pa.ipc.new_file(filename, batch.schema, options=options)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("No identities to export.")
 
 class IdentityImporter:
     @staticmethod
@@ -251,6 +2024,80 @@ class IdentityImporter:
             identities = json.load(jsonfile)
         return identities
 
+    @staticmethod
+    def iter_from_jsonl(filename, chunk_size=SHARD_SIZE, compression=None, skip=0):
+        # Yields lists of identities; skip lets a consumer resume after the rows it already processed.
+        with open_text_file(filename, 'r', compression) as jsonlfile:
+            lines = (line for line in islice(jsonlfile, skip, None) if line.strip())
+            while True:
+                chunk = [json.loads(line) for line in islice(lines, chunk_size)]
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def import_from_jsonl(filename, compression=None, skip=0):
+        identities = IdentityTable()
+        for chunk in IdentityImporter.iter_from_jsonl(filename, compression=compression, skip=skip):
+            identities.extend(chunk)
+        return identities
+
+    @staticmethod
+    def record_batch_to_table(batch):
+        # Fills the table straight from the Arrow buffers instead of going through Python objects.
+        table = IdentityTable()
+        for field in IDENTITY_FIELDS:
+            array = batch.column(field)
+            if array.null_count:
+                raise ValueError(f"Column '{field}' contains null values.")
+            column = table.column(field)
+            if field in IdentityTable.categorical_fields:
+                if not pa.types.is_dictionary(array.type):
+                    array = array.dictionary_encode()
+                column.extend_codes(array.dictionary.to_pylist(), array.indices.to_numpy())
+            elif field in IdentityTable.integer_fields:
+                column.values.frombytes(array.to_numpy().astype(np.intc).tobytes())
+            elif field == 'dob' and pa.types.is_date(array.type):
+                column.extend(np.datetime_as_string(array.to_numpy(zero_copy_only=False), unit='D').tolist())
+            else:
+                array = array.cast(pa.large_string())
+                _, offsets, data = array.buffers()
+                offsets = np.frombuffer(offsets, dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+                values = memoryview(data)[offsets[0]:offsets[-1]] if data is not None else b''
+                column.extend_buffers(values, offsets - offsets[0])
+        return table
+
+    @staticmethod
+    def iter_from_parquet(filename, batch_size=SHARD_SIZE):
+        if pq is None:
+            raise ImportError("Parquet import requires the 'pyarrow' package.")
+        parquet_file = pq.ParquetFile(filename, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield IdentityImporter.record_batch_to_table(batch)
+
+    @staticmethod
+    def import_from_parquet(filename):
+        identities = IdentityTable()
+        for chunk in IdentityImporter.iter_from_parquet(filename):
+            identities.extend(chunk)
+        return identities
+
+    @staticmethod
+    def iter_from_arrow(filename):
+        if pa is None:
+            raise ImportError("Arrow import requires the 'pyarrow' package.")
+        with pa.memory_map(filename) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield IdentityImporter.record_batch_to_table(reader.get_batch(index))
+
+    @staticmethod
+    def import_from_arrow(filename):
+        identities = IdentityTable()
+        for chunk in IdentityImporter.iter_from_arrow(filename):
+            identities.extend(chunk)
+        return identities
+
     @staticmethod
     def import_from_sql(db_name):
         conn = sqlite3.connect(db_name)
@@ -269,34 +2116,181 @@ class IdentityImporter:
         return identities
 
 class FakeIdentitySystem:
-    def __init__(self):
-        self.identity_generator = IdentityGenerator()
-        self.ml_model = MachineLearningModel()
-        self.generated_identities = []
+    def __init__(self, valid_identities=False, unique_identities=False, model_cache_dir=None, enhancer='forest',
+                 index_identities=True, unique_key=None, row_offset=0, encryption_key=None, encryption_key_file=None):
+        if enhancer not in ENHANCERS:
+            raise ValueError(f"Invalid enhancer. Use {', '.join(ENHANCERS)}.")
+        # In unique mode, a later run that must not collide with this one (e.g. a second fixture
+        # appended to the same database) reuses identity_generator.unique_key and starts at
+        # row_offset=identity_generator.next_row of this run.
+        self.identity_generator = IdentityGenerator(valid=valid_identities, unique=unique_identities, unique_key=unique_key,
+                                                    row_offset=row_offset)
+        if enhancer == 'conditional':
+            self.ml_model = ConditionalDistributionEnhancer()
+        else:
+            self.ml_model = MachineLearningModel(cache_dir=model_cache_dir)
+        self.ml_model.load_latest()
+        self.generated_identities = IdentityTable()
+        # With index_identities=False the search index is only brought up to date by the first search.
+        self.index_identities = index_identities
+        self.search_index = IdentitySearchIndex(self.generated_identities)
         self.data_validator = DataValidator()
-        self.identity_encryptor = IdentityEncryptor()
-        self.identity_analyzer = None  # Inicializado como None
+        # Without a key or key file every system encrypts with a fresh key, so its exports can only
+        # be decrypted by the same process.
+        if encryption_key_file is not None:
+            self.identity_encryptor = IdentityEncryptor.from_key_file(encryption_key_file)
+        else:
+            self.identity_encryptor = IdentityEncryptor(encryption_key)
+        self.encrypted_identities = []
+        self.decrypted_identities = []
+        self.decryption_failures = []
+        self.validation_report = None
+        self.identity_analyzer = IdentityAnalyzer()
         self.identity_exporter = IdentityExporter()
         self.identity_importer = IdentityImporter()
+        self.instrumentation = Instrumentation()
 
-    def generate_identities(self, num_identities):
-        self.generated_identities.extend([
-            self.identity_generator.generate_identity() 
-            for _ in range(num_identities)
-        ])
+    def enable_instrumentation(self, profile=False, trace_memory=False):
+        # Faker provider calls are timed in this process only; shards generated by worker
+        # processes show up in the operation timings but not per provider.
+        self.instrumentation.enabled = True
+        self.instrumentation.profile = profile
+        self.instrumentation.trace_memory = trace_memory
+        generator = self.identity_generator
+        if not isinstance(generator.fake, TimedFaker):
+            generator.fake = TimedFaker(generator.fake, self.instrumentation)
+            if generator.value_pool is not None:
+                generator.value_pool.providers = generator.pool_providers()
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation.enabled = False
+        generator = self.identity_generator
+        if isinstance(generator.fake, TimedFaker):
+            generator.fake = generator.fake.fake
+            if generator.value_pool is not None:
+                generator.value_pool.providers = generator.pool_providers()
+
+    @instrumented('generate_identities')
+    def generate_identities(self, num_identities, vectorized=False, workers=1, seed=None, progress=None, chunk_size=SHARD_SIZE):
+        # progress(done, total) is called after every chunk; raising OperationCancelled from it stops
+        # generation and keeps the chunks added so far.
+        if seed is not None or workers > 1 or progress:
+            done = 0
+            for chunk in self.iter_identities(num_identities, chunk_size, vectorized, workers, seed):
+                self.add_identities(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, num_identities)
+        elif vectorized:
+            self.add_identities(IdentityTable.from_batch(self.identity_generator.generate_batch(num_identities)))
+        else:
+            self.add_identities(IdentityTable([
+                self.identity_generator.generate_identity() 
+                for _ in range(num_identities)
+            ]))
         print(f"Generated {num_identities} fake identities.")
-        self.identity_analyzer = IdentityAnalyzer(self.generated_identities)
 
-    def train_model(self):
+    def add_identities(self, identities):
+        self.instrumentation.count('identities_added', len(identities))
+        self.generated_identities.extend(identities)
+        self.identity_analyzer.update(identities)
+        if self.index_identities:
+            self.search_index.update()
+
+    @instrumented('search_identities')
+    def search_identities(self, text, limit=SEARCH_RESULT_LIMIT):
+        self.search_index.update()
+        return self.search_index.query(text, limit)
+
+    def generate_sharded(self, num_identities, seed, vectorized=False, workers=1, shard_size=SHARD_SIZE):
+        identities = IdentityTable()
+        for chunk in self.iter_identities(num_identities, shard_size, vectorized, workers, seed):
+            identities.extend(chunk)
+        return identities
+
+    def iter_identities(self, num_identities, chunk_size=SHARD_SIZE, vectorized=False, workers=1, seed=None):
+        if seed is None and workers <= 1:
+            for _, size in iter_shards(num_identities, chunk_size):
+                if vectorized:
+                    yield IdentityTable.from_batch(self.identity_generator.generate_batch(size))
+                else:
+                    yield IdentityTable([self.identity_generator.generate_identity() for _ in range(size)])
+            return
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        generator = self.identity_generator
+        pool_options = generator.pool_options()
+        # Reserve the whole row range up front; shard i owns rows from first_row + i * chunk_size.
+        first_row = generator.next_row
+        generator.next_row += num_identities
+        shards = (
+            (shard_index, size, first_row + shard_index * chunk_size)
+            for shard_index, size in iter_shards(num_identities, chunk_size)
+        )
+        if workers <= 1:
+            for shard_index, size, row_offset in shards:
+                yield generate_shard(seed, shard_index, size, vectorized, pool_options, generator.valid, generator.unique, row_offset,
+                                     generator.unique_key)
+            return
+        # Keep only a few shards in flight so memory stays bounded by the window, not by num_identities.
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for shard_index, size, row_offset in shards:
+                pending.append(executor.submit(generate_shard, seed, shard_index, size, vectorized, pool_options,
+                                               generator.valid, generator.unique, row_offset, generator.unique_key))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def export_identity_stream(self, format, filename, num_identities, chunk_size=SHARD_SIZE, vectorized=False, workers=1, seed=None):
+        chunks = self.iter_identities(num_identities, chunk_size, vectorized, workers, seed)
+        self.export_identities(format, filename, identities=chain.from_iterable(chunks))
+
+    @instrumented('train_model')
+    def train_model(self, progress=None):
         if not self.generated_identities:
             print("No identities generated yet. Generate some identities first.")
-            return
+            return False
         X, y = self.ml_model.prepare_data(self.generated_identities)
         try:
-            self.ml_model.train(X, y)
+            self.ml_model.train(X, y, progress)
+        except ValueError as e:
+            print(f"Error training model: {str(e)}")
+            return False
+        return True
+
+    @instrumented('train_model_streaming')
+    def train_model_streaming(self, num_identities=None, format=None, filename=None, chunk_size=SHARD_SIZE,
+                              trees_per_chunk=10, workers=1, seed=None, **options):
+        # Trains chunk by chunk from an exported file, or from freshly generated identities when
+        # no file is given; neither is ever fully loaded into memory.
+        if filename:
+            chunks = self.iter_import(format, filename, chunk_size, **options)
+        elif num_identities:
+            chunks = self.iter_identities(num_identities, chunk_size, vectorized=True, workers=workers, seed=seed)
+        else:
+            print("Nothing to train on. Pass num_identities or a file to read.")
+            return None
+        try:
+            return self.ml_model.train_chunks(chunks, trees_per_chunk)
         except ValueError as e:
             print(f"Error training model: {str(e)}")
+            return None
 
+    def iter_import(self, format, filename, chunk_size=SHARD_SIZE, **options):
+        chunk_readers = {
+            'jsonl': lambda: self.identity_importer.iter_from_jsonl(filename, chunk_size, **options),
+            'parquet': lambda: self.identity_importer.iter_from_parquet(filename, chunk_size),
+            'arrow': lambda: self.identity_importer.iter_from_arrow(filename)
+        }
+        chunk_reader = chunk_readers.get((format or '').lower())
+        if chunk_reader is None:
+            raise ValueError(f"Chunked import is not supported for format '{format}'. Use {', '.join(chunk_readers)}.")
+        return chunk_reader()
+
+    @instrumented('generate_enhanced_identity')
     def generate_enhanced_identity(self):
         if not self.ml_model.is_trained:
             print("Model not trained yet. Train the model first.")
@@ -307,6 +2301,18 @@ class FakeIdentitySystem:
             base_identity['country'] = predicted_country
         return base_identity
 
+    @instrumented('generate_enhanced_identities')
+    def generate_enhanced_identities(self, num_identities, chunk_size=SHARD_SIZE):
+        if not self.ml_model.is_trained:
+            print("Model not trained yet. Train the model first.")
+            return None
+        identities = IdentityTable()
+        for _, size in iter_shards(num_identities, chunk_size):
+            batch = self.identity_generator.generate_batch(size)
+            batch['country'] = self.ml_model.predict_batch(batch)
+            identities.extend_batch(batch)
+        return identities
+
     def save_identities_to_file(self, filename):
         with open(filename, 'w', encoding='utf-8') as f:
             for identity in self.generated_identities:
@@ -338,35 +2344,112 @@ class FakeIdentitySystem:
         return id_card
 
     def validate_identity(self, identity):
-        return all([
-            self.data_validator.validate_age(identity['age']),
-            self.data_validator.validate_email(identity['email']),
-            self.data_validator.validate_phone(identity['phone']),
-            self.data_validator.validate_credit_card(identity['credit_card'])
-        ])
+        return (self.data_validator.validate_age(identity['age'])
+                and self.data_validator.validate_email(identity['email'])
+                and self.data_validator.validate_phone(identity['phone'])
+                and self.data_validator.validate_credit_card(identity['credit_card']))
+
+    @instrumented('validate_identities')
+    def validate_identities(self, identities):
+        masks, _ = self.data_validator.validate_batch(identities)
+        return masks['valid'].tolist()
+
+    @instrumented('validate_dataset')
+    def validate_dataset(self, workers=1, chunk_size=VALIDATION_CHUNK_SIZE, report_filename=None):
+        identities = self.generated_identities
+        starts = range(0, len(identities), chunk_size)
+        chunks = (identities.slice(start, start + chunk_size) for start in starts)
+        if workers <= 1:
+            results = map(validate_chunk, chunks, starts)
+            report = self._build_validation_report(results)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                report = self._build_validation_report(executor.map(validate_chunk, chunks, starts))
+        self.validation_report = report
+        summary = report.summary()
+        print(f"Validated {summary['total']} identities: {summary['valid']} valid.")
+        for rule, count in summary['failures'].items():
+            print(f"  {rule}: {count} failed")
+        if report_filename:
+            report.save(report_filename)
+            print(f"Validation report saved to {report_filename}")
+        return report
+
+    def _build_validation_report(self, results):
+        failures = {rule: [] for rule in DataValidator.rules}
+        for chunk_failures in results:
+            for rule, indices in chunk_failures.items():
+                failures[rule].append(indices)
+        return ValidationReport(len(self.generated_identities), {
+            rule: np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+            for rule, indices in failures.items()
+        })
 
-    def encrypt_identities(self):
+    @instrumented('encrypt_identities')
+    def encrypt_identities(self, mode='field', workers=1, progress=None):
         try:
-            self.encrypted_identities = [
-                self.identity_encryptor.encrypt_identity(identity) 
-                for identity in self.generated_identities
-            ]
+            self.encrypted_identities = self.identity_encryptor.encrypt_identities(self.generated_identities, mode, workers,
+                                                                                   progress=progress)
+            self.instrumentation.count('identities_encrypted', len(self.encrypted_identities))
             print("Identities encrypted successfully.")
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"Encryption failed: {str(e)}")
 
+    @instrumented('export_encrypted_identities')
+    def export_encrypted_identities(self, filename, compression=None):
+        try:
+            self.identity_exporter.export_to_jsonl(self.encrypted_identities, filename, compression)
+            print(f"Encrypted identities exported successfully to {filename}")
+        except Exception as e:
+            print(f"Export failed: {str(e)}")
 
-    def encrypt_identities(self):
+    @instrumented('decrypt_identities')
+    def decrypt_identities(self, filename=None, workers=1, chunk_size=ENCRYPTION_CHUNK_SIZE, compression=None,
+                           key=None, key_file=None, progress=None):
+        # Decrypts self.encrypted_identities, or an encrypted JSON Lines export when filename is given.
+        # key or key_file decrypt with that key (e.g. an export written by another process)
+        # instead of the system's own.
+        if filename is not None:
+            source = chain.from_iterable(self.identity_importer.iter_from_jsonl(filename, chunk_size, compression))
+        else:
+            source = self.encrypted_identities
+        self.decrypted_identities = []
+        self.decryption_failures = []
         try:
-            self.encrypted_identities = [
-                self.identity_encryptor.encrypt_identity(identity) 
-                for identity in self.generated_identities
-            ]
-            print("Identities encrypted successfully.")
+            encryptor = self.identity_encryptor
+            if key_file is not None:
+                with open(key_file, 'rb') as keyfile:
+                    key = keyfile.read().strip()
+            if key is not None:
+                encryptor = IdentityEncryptor(key, encryptor.encrypted_fields)
+            for decrypted_chunk, failures in encryptor.iter_decrypt(source, workers, chunk_size, progress):
+                self.decrypted_identities.extend(decrypted_chunk)
+                self.decryption_failures.extend(failures)
+        except OperationCancelled:
+            raise
         except Exception as e:
-            print(f"Encryption failed: {str(e)}")
+            print(f"Decryption failed: {str(e)}")
+            return self.decrypted_identities
+        self.instrumentation.count('identities_decrypted', len(self.decrypted_identities))
+        self.instrumentation.count('decryption_failures', len(self.decryption_failures))
+        print(f"Decrypted {len(self.decrypted_identities)} identities ({len(self.decryption_failures)} failed).")
+        for index, error in self.decryption_failures[:10]:
+            print(f"  Record {index}: {error}")
+        return self.decrypted_identities
+
+    def set_encryption_policy(self, encrypted_fields=None):
+        self.identity_encryptor.encrypted_fields = None if encrypted_fields is None else frozenset(encrypted_fields)
+
+    def encrypted_identity_views(self):
+        return [self.identity_encryptor.wrap(identity) for identity in self.encrypted_identities]
 
+    @instrumented('analyze_identities')
     def analyze_identities(self):
+        if not self.identity_analyzer.count:
+            print("No identities generated yet. Generate some identities first.")
+            return
         age_distribution = self.identity_analyzer.get_age_distribution()
         gender_distribution = self.identity_analyzer.get_gender_distribution()
         country_distribution = self.identity_analyzer.get_country_distribution()
@@ -378,41 +2461,59 @@ class FakeIdentitySystem:
         print(f"Country Distribution: {country_distribution}")
         print(f"Most Common Names: {common_names}")
 
-    def export_identities(self, format, filename):
+    @instrumented('export_identities')
+    def export_identities(self, format, filename, identities=None, progress=None, **options):
+        if identities is None:
+            identities = self.generated_identities
+        if progress:
+            # Tables report progress from inside the exporters, chunk by chunk, so they keep their
+            # columnar paths; anything else is counted row by row as it streams through.
+            if isinstance(identities, IdentityTable):
+                options['progress'] = progress
+            else:
+                identities = iter_with_progress(identities, progress)
         export_methods = {
             'csv': self.identity_exporter.export_to_csv,
             'json': self.identity_exporter.export_to_json,
+            'jsonl': self.identity_exporter.export_to_jsonl,
+            'parquet': self.identity_exporter.export_to_parquet,
+            'arrow': self.identity_exporter.export_to_arrow,
             'sql': self.identity_exporter.export_to_sql
         }
 
         export_method = export_methods.get(format.lower())
         if export_method:
             try:
-                export_method(self.generated_identities, filename)
+                export_method(identities, filename, **options)
                 print(f"Identities exported successfully to {filename}")
+            except OperationCancelled:
+                raise
             except Exception as e:
                 print(f"Export failed: {str(e)}")
         else:
-            print("Invalid format. Please choose 'csv', 'json', or 'sql'.")
+            print(f"Invalid format. Please choose one of: {', '.join(export_methods)}.")
 
-    def import_identities(self, format, filename):
+    @instrumented('import_identities')
+    def import_identities(self, format, filename, **options):
         import_methods = {
             'csv': self.identity_importer.import_from_csv,
             'json': self.identity_importer.import_from_json,
+            'jsonl': self.identity_importer.import_from_jsonl,
+            'parquet': self.identity_importer.import_from_parquet,
+            'arrow': self.identity_importer.import_from_arrow,
             'sql': self.identity_importer.import_from_sql
         }
         
         import_method = import_methods.get(format.lower())
         if import_method:
             try:
-                imported_identities = import_method(filename)
-                self.generated_identities.extend(imported_identities)
-                self.identity_analyzer = IdentityAnalyzer(self.generated_identities)
+                imported_identities = import_method(filename, **options)
+                self.add_identities(imported_identities)
                 print(f"Imported {len(imported_identities)} identities from {filename}")
             except Exception as e:
                 print(f"Import failed: {str(e)}")
         else:
-            print("Invalid format. Please choose 'csv', 'json', or 'sql'.")
+            print(f"Invalid format. Please choose one of: {', '.join(import_methods)}.")
 
     def run(self):
         print("Fake Identity Generation System")
@@ -481,18 +2582,17 @@ class FakeIdentitySystem:
             
             elif choice == '8':
                 self.decrypt_identities()
-                print("Identities decrypted successfully.")
             
             elif choice == '9':
                 self.analyze_identities()
             
             elif choice == '10':
-                format = input("Enter export format (csv/json/sql): ")
+                format = input("Enter export format (csv/json/jsonl/parquet/arrow/sql): ")
                 filename = input("Enter filename for export: ")
                 self.export_identities(format, filename)
             
             elif choice == '11':
-                format = input("Enter import format (csv/json/sql): ")
+                format = input("Enter import format (csv/json/jsonl/parquet/arrow/sql): ")
                 filename = input("Enter filename for import: ")
                 self.import_identities(format, filename)
             